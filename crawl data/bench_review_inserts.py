@@ -0,0 +1,122 @@
+"""
+bench_review_inserts.py
+
+So sánh tốc độ ghi SentimentReviews (rows/giây) giữa:
+- row:   một cursor.execute cho mỗi review (cách cũ của FINAL CODE.py)
+- batch: gom review của cả lô phim, một executemany với fast_executemany (cách hiện tại)
+Ghi vào bảng tạm #bench_reviews cùng cấu trúc SentimentReviews, không đụng dữ liệu thật.
+
+Chạy: python "crawl data/bench_review_inserts.py" [số phim, mặc định 100] [phim mỗi lô, mặc định 10]
+Chuỗi kết nối lấy từ BENCH_CONN_STR (mặc định: database FILM TRENDING như FINAL CODE.py).
+Mỗi lần chạy ghi thêm một dòng vào BENCH_RESULTS (mặc định bench_review_inserts.jsonl): thời điểm, phiên bản
+SQL Server, số dòng, rows/giây trước (row) và sau (batch).
+
+Kết quả đo: chưa có số liệu trên SQL Server thật (lúc viết script không có instance để chạy);
+lần chạy đầu trên máy dev sẽ tạo dòng đầu tiên trong BENCH_RESULTS.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+import pyodbc
+
+CONN_STR = os.getenv("BENCH_CONN_STR", (
+    "DRIVER={ODBC Driver 17 for SQL Server};"
+    "SERVER=localhost;"
+    "DATABASE=FILM TRENDING;"
+    "Trusted_Connection=yes;"
+))
+RESULTS_PATH = os.getenv("BENCH_RESULTS", "bench_review_inserts.jsonl")
+INSERT_SQL = """
+    INSERT INTO #bench_reviews (Movie_id, Title, Genre, Sentiment_label, Sentiment_score, Language)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def make_reviews(n_movies):
+    """Review giả lập như simulate_reviews của FINAL CODE.py: 8-15 review mỗi phim."""
+    movies = []
+    for idx in range(1, n_movies + 1):
+        rows = []
+        for _ in range(random.randint(8, 15)):
+            score = round(random.uniform(-1, 1), 3)
+            label = "Positive" if score > 0.1 else "Negative" if score < -0.1 else "Neutral"
+            rows.append((idx, f"Movie {idx}", random.choice(["Action", "Drama", "Comedy"]), label, score, "en"))
+        movies.append(rows)
+    return movies
+
+
+def insert_row_by_row(conn, cursor, batch):
+    for reviews in batch:
+        for review in reviews:
+            cursor.execute(INSERT_SQL, review)
+    conn.commit()
+
+
+def insert_batched(conn, cursor, batch):
+    cursor.fast_executemany = True
+    try:
+        cursor.executemany(INSERT_SQL, [review for reviews in batch for review in reviews])
+    finally:
+        cursor.fast_executemany = False
+    conn.commit()
+
+
+def run(conn, movies, batch_size, write):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE #bench_reviews (
+            Review_id INT IDENTITY(1,1) PRIMARY KEY,
+            Movie_id INT,
+            Title NVARCHAR(255),
+            Genre NVARCHAR(100),
+            Sentiment_label NVARCHAR(20),
+            Sentiment_score FLOAT,
+            Language NVARCHAR(20)
+        )
+    """)
+    conn.commit()
+    started = time.perf_counter()
+    for i in range(0, len(movies), batch_size):
+        write(conn, cursor, movies[i:i + batch_size])
+    elapsed = time.perf_counter() - started
+    cursor.execute("SELECT COUNT(*) FROM #bench_reviews")
+    rows = cursor.fetchone()[0]
+    cursor.execute("DROP TABLE #bench_reviews")
+    conn.commit()
+    cursor.close()
+    return rows, elapsed
+
+
+def main():
+    n_movies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    movies = make_reviews(n_movies)
+    total = sum(len(r) for r in movies)
+    print(f"🧪 {n_movies} phim, {total} review, {batch_size} phim mỗi lô")
+
+    conn = pyodbc.connect(CONN_STR, autocommit=False)
+    try:
+        server = conn.cursor().execute("SELECT @@VERSION").fetchone()[0].splitlines()[0]
+        results = {}
+        for name, write in (("row", insert_row_by_row), ("batch", insert_batched)):
+            rows, elapsed = run(conn, movies, batch_size, write)
+            results[name] = rows / elapsed if elapsed else float("inf")
+            print(f"⏱️ {name:<6} {rows} dòng trong {elapsed:.2f}s -> {results[name]:,.0f} rows/s")
+        print(f"🚀 batch nhanh hơn {results['batch'] / results['row']:.1f} lần")
+        with open(RESULTS_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "at": time.strftime("%Y-%m-%dT%H:%M:%S"), "server": server, "movies": n_movies,
+                "reviews": total, "batch_size": batch_size,
+                "row_rows_per_s": round(results["row"]), "batch_rows_per_s": round(results["batch"]),
+            }, ensure_ascii=False) + "\n")
+        print(f"💾 Đã ghi kết quả vào {RESULTS_PATH}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+bulk_loader.py
+
+Nạp phim hàng loạt theo tập (set-based) vào schema XUHUONGPHIM (sql/SQLQuery1.sql):
+- Gom các phim đã parse (MovieRecord từ parse_movie trong crawl data.py) vào bảng tạm #stg_* bằng fast_executemany
+- Mỗi bảng đích đúng MỘT câu MERGE: Movies, Movie_Genres, Movie_Cast, Financials, Ratings, Streaming_Popularity
+- Chỉ UPDATE khi dữ liệu thực sự khác (so sánh null-safe bằng EXCEPT)
+- Hash payload của các phim vừa nạp được MERGE vào Movie_Payload_Hash trong cùng transaction
+- Báo cáo số dòng inserted / updated theo bảng và tốc độ rows/giây
+"""
+
+import logging
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from movie_record import MovieRecord
+
+STAGING_DDL = """
+CREATE TABLE #stg_movies (
+    movie_id NVARCHAR(50) PRIMARY KEY,
+    tmdb_id INT,
+    title NVARCHAR(255),
+    release_date DATE,
+    country NVARCHAR(100),
+    language NVARCHAR(50),
+    director_id INT,
+    budget BIGINT,
+    revenue BIGINT,
+    imdb_rating FLOAT,
+    imdb_votes INT,
+    sp_rank INT,
+    sp_hours BIGINT
+);
+CREATE TABLE #stg_movie_genres (movie_id NVARCHAR(50), genre_id INT, PRIMARY KEY (movie_id, genre_id));
+CREATE TABLE #stg_movie_cast (movie_id NVARCHAR(50), person_id INT, PRIMARY KEY (movie_id, person_id));
+CREATE TABLE #stg_payload_hash (movie_id NVARCHAR(50), source NVARCHAR(20), payload_hash BINARY(32), PRIMARY KEY (movie_id, source));
+"""
+
+MERGES = {
+    "Movies": """
+        MERGE Movies AS t
+        USING #stg_movies AS s ON t.movie_id = s.movie_id
+        WHEN MATCHED AND EXISTS (SELECT s.tmdb_id, s.title, s.release_date, s.country, s.language, s.director_id
+                                 EXCEPT SELECT t.tmdb_id, t.title, t.release_date, t.country, t.language, t.director_id)
+            THEN UPDATE SET tmdb_id = s.tmdb_id, title = s.title, release_date = s.release_date, country = s.country,
+                            language = s.language, director_id = s.director_id
+        WHEN NOT MATCHED THEN
+            INSERT (movie_id, tmdb_id, title, release_date, country, language, director_id)
+            VALUES (s.movie_id, s.tmdb_id, s.title, s.release_date, s.country, s.language, s.director_id)
+        OUTPUT $action;
+    """,
+    "Movie_Genres": """
+        MERGE Movie_Genres AS t
+        USING #stg_movie_genres AS s ON t.movie_id = s.movie_id AND t.genre_id = s.genre_id
+        WHEN NOT MATCHED THEN INSERT (movie_id, genre_id) VALUES (s.movie_id, s.genre_id)
+        OUTPUT $action;
+    """,
+    "Movie_Cast": """
+        MERGE Movie_Cast AS t
+        USING #stg_movie_cast AS s ON t.movie_id = s.movie_id AND t.person_id = s.person_id AND t.role_type = 'Actor'
+        WHEN NOT MATCHED THEN INSERT (movie_id, person_id, role_type) VALUES (s.movie_id, s.person_id, 'Actor')
+        OUTPUT $action;
+    """,
+    "Financials": """
+        MERGE Financials AS t
+        USING #stg_movies AS s ON t.movie_id = s.movie_id
+        WHEN MATCHED AND EXISTS (SELECT s.budget, s.revenue EXCEPT SELECT t.budget, t.revenue_domestic)
+            THEN UPDATE SET budget = s.budget, revenue_domestic = s.revenue
+        WHEN NOT MATCHED THEN
+            INSERT (movie_id, budget, revenue_domestic, revenue_international) VALUES (s.movie_id, s.budget, s.revenue, NULL)
+        OUTPUT $action;
+    """,
+    "Ratings": """
+        MERGE Ratings AS t
+        USING (SELECT movie_id, imdb_rating, imdb_votes FROM #stg_movies WHERE imdb_rating IS NOT NULL) AS s
+            ON t.movie_id = s.movie_id AND t.source_name = 'IMDb'
+        WHEN MATCHED AND EXISTS (SELECT s.imdb_rating, s.imdb_votes EXCEPT SELECT t.score, t.vote_count)
+            THEN UPDATE SET score = s.imdb_rating, vote_count = s.imdb_votes, last_updated = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (movie_id, source_name, score, vote_count, last_updated)
+            VALUES (s.movie_id, 'IMDb', s.imdb_rating, s.imdb_votes, GETDATE())
+        OUTPUT $action;
+    """,
+    # Streaming popularity - mock data, chỉ thêm mới như save_movie_record
+    "Streaming_Popularity": """
+        MERGE Streaming_Popularity AS t
+        USING #stg_movies AS s ON t.movie_id = s.movie_id AND t.platform_name = 'Netflix'
+        WHEN NOT MATCHED THEN
+            INSERT (movie_id, platform_name, rank, hours_viewed, measurement_week)
+            VALUES (s.movie_id, 'Netflix', s.sp_rank, s.sp_hours, GETDATE())
+        OUTPUT $action;
+    """,
+    "Movie_Payload_Hash": """
+        MERGE Movie_Payload_Hash AS t
+        USING #stg_payload_hash AS s ON t.movie_id = s.movie_id AND t.source = s.source
+        WHEN MATCHED THEN UPDATE SET payload_hash = s.payload_hash, checked_at = GETDATE(), updated_at = GETDATE()
+        WHEN NOT MATCHED THEN INSERT (movie_id, source, payload_hash) VALUES (s.movie_id, s.source, s.payload_hash)
+        OUTPUT $action;
+    """,
+}
+
+
+def bulk_load(conn, records: List[MovieRecord], people, genres, hashes=None,
+              hash_rows: List[Tuple[str, str, bytes]] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Nạp danh sách phim đã parse trong một transaction.
+    people / genres: NameIdCache đã load (resolve tên -> id theo lô).
+    hashes / hash_rows: PayloadHashStore và các (movie_id, nguồn, hash) mới của lô (tùy chọn);
+    phim không đổi mà store đang giữ được đánh dấu checked_at trong cùng transaction.
+    Trả về {bảng: {"inserted": n, "updated": m}}.
+    """
+    started = time.perf_counter()
+    # phim trùng movie_id trong cùng lô: giữ bản mới nhất
+    records = list({r.movie_id: r for r in records}.values())
+    hash_rows = list({(m, src): (m, src, h) for m, src, h in (hash_rows or [])}.values())
+    if not records:
+        if hashes is not None:
+            cursor = conn.cursor()
+            try:
+                hashes.touch_checked(cursor)
+                conn.commit()
+            finally:
+                cursor.close()
+        return {}
+    cursor = conn.cursor()
+    try:
+        person_ids = people.resolve(cursor, [n for r in records for n in (r.director, *r.cast)])
+        genre_ids = genres.resolve(cursor, [g for r in records for g in r.genres])
+
+        movie_rows = [(r.movie_id, r.tmdb_id, r.title, r.release_date, r.country, r.language,
+                       person_ids.get(r.director), r.budget, r.revenue, r.imdb_rating, r.imdb_votes,
+                       random.randint(1, 50), random.randint(10000, 500000)) for r in records]
+        genre_rows = list({(r.movie_id, genre_ids[g]) for r in records for g in r.genres})
+        cast_rows = list({(r.movie_id, person_ids[n]) for r in records for n in r.cast})
+
+        cursor.execute(STAGING_DDL)
+        cursor.fast_executemany = True
+        cursor.executemany("INSERT INTO #stg_movies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", movie_rows)
+        if genre_rows:
+            cursor.executemany("INSERT INTO #stg_movie_genres VALUES (?, ?)", genre_rows)
+        if cast_rows:
+            cursor.executemany("INSERT INTO #stg_movie_cast VALUES (?, ?)", cast_rows)
+        if hash_rows:
+            cursor.executemany("INSERT INTO #stg_payload_hash VALUES (?, ?, ?)", hash_rows)
+        cursor.fast_executemany = False
+
+        stats = {}
+        for table, sql in MERGES.items():
+            cursor.execute(sql)
+            actions = Counter(row[0] for row in cursor.fetchall())
+            stats[table] = {"inserted": actions.get("INSERT", 0), "updated": actions.get("UPDATE", 0)}
+        if hashes is not None:
+            hashes.touch_checked(cursor)
+
+        cursor.execute("DROP TABLE #stg_movies; DROP TABLE #stg_movie_genres; DROP TABLE #stg_movie_cast; "
+                       "DROP TABLE #stg_payload_hash;")
+        conn.commit()
+        people.commit()
+        genres.commit()
+        if hashes is not None:
+            hashes.remember(hash_rows)
+            hashes.commit()
+    except Exception:
+        conn.rollback()
+        people.rollback()
+        genres.rollback()
+        if hashes is not None:
+            hashes.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    elapsed = time.perf_counter() - started
+    staged = len(movie_rows) + len(genre_rows) + len(cast_rows)
+    for table, st in stats.items():
+        logging.info("Bulk load %-20s inserted=%d updated=%d", table, st["inserted"], st["updated"])
+    logging.info("Bulk load: %d movies (%d staged rows) in %.2fs — %.0f rows/s",
+                 len(records), staged, elapsed, staged / elapsed if elapsed else 0)
+    return stats
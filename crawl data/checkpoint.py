@@ -0,0 +1,138 @@
+"""
+checkpoint.py
+
+Checkpoint cục bộ (SQLite) cho crawl tăng dần:
+- Danh sách TMDb id đã xử lý + thời điểm cập nhật cuối (last_updated)
+- Mỗi lượt chạy lưu kế hoạch (danh sách id) và đánh dấu từng id khi đã COMMIT vào DB,
+  nên lượt chạy bị ngắt giữa chừng có thể tiếp tục đúng chỗ đã dừng
+- Thời điểm bắt đầu của lượt chạy thành công gần nhất (mốc cho TMDb /movie/changes)
+- Tiến độ từng shard (year, page) của discover nhiều năm: fetched -> done khi mọi phim của shard đã commit
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class CrawlCheckpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS movies (
+                tmdb_id INTEGER PRIMARY KEY,
+                last_updated REAL
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at REAL,
+                finished_at REAL,
+                status TEXT
+            );
+            CREATE TABLE IF NOT EXISTS run_items (
+                run_id INTEGER,
+                seq INTEGER,
+                tmdb_id INTEGER,
+                refresh INTEGER DEFAULT 0,
+                done INTEGER DEFAULT 0,
+                PRIMARY KEY (run_id, tmdb_id)
+            );
+            CREATE TABLE IF NOT EXISTS discover_shards (
+                job TEXT,
+                year INTEGER,
+                page INTEGER,
+                total_pages INTEGER,
+                items INTEGER,
+                status TEXT,
+                updated_at REAL,
+                PRIMARY KEY (job, year, page)
+            );
+        """)
+        self._db.commit()
+
+    def unfinished_run(self) -> Optional[int]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT run_id FROM runs WHERE status = 'running' ORDER BY run_id DESC LIMIT 1").fetchone()
+            return row[0] if row else None
+
+    def start_run(self, items: Iterable[dict]) -> int:
+        """Tạo lượt chạy mới với kế hoạch là danh sách {"id", "refresh"}."""
+        with self._lock:
+            cur = self._db.execute("INSERT INTO runs (started_at, status) VALUES (?, 'running')", (time.time(),))
+            run_id = cur.lastrowid
+            self._db.executemany(
+                "INSERT OR IGNORE INTO run_items (run_id, seq, tmdb_id, refresh) VALUES (?, ?, ?, ?)",
+                ((run_id, seq, it["id"], int(bool(it.get("refresh")))) for seq, it in enumerate(items)))
+            self._db.commit()
+            return run_id
+
+    def pending(self, run_id: int) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT tmdb_id, refresh FROM run_items WHERE run_id = ? AND done = 0 ORDER BY seq", (run_id,)).fetchall()
+        return [{"id": tmdb_id, "refresh": bool(refresh)} for tmdb_id, refresh in rows]
+
+    def mark_done(self, run_id: int, tmdb_ids: Iterable[int]):
+        now = time.time()
+        ids = [i for i in tmdb_ids if i is not None]
+        with self._lock:
+            self._db.executemany("UPDATE run_items SET done = 1 WHERE run_id = ? AND tmdb_id = ?",
+                                 ((run_id, i) for i in ids))
+            self._db.executemany("INSERT OR REPLACE INTO movies (tmdb_id, last_updated) VALUES (?, ?)",
+                                 ((i, now) for i in ids))
+            self._db.commit()
+
+    def finish_run(self, run_id: int):
+        with self._lock:
+            self._db.execute("UPDATE runs SET finished_at = ?, status = 'done' WHERE run_id = ?", (time.time(), run_id))
+            self._db.commit()
+
+    def last_success(self) -> Optional[float]:
+        """Thời điểm BẮT ĐẦU của lượt chạy hoàn tất gần nhất (epoch seconds)."""
+        with self._lock:
+            row = self._db.execute("SELECT MAX(started_at) FROM runs WHERE status = 'done'").fetchone()
+            return row[0] if row and row[0] else None
+
+    def known_ids(self) -> Set[int]:
+        with self._lock:
+            return {r[0] for r in self._db.execute("SELECT tmdb_id FROM movies")}
+
+    def run_progress(self, run_id: int) -> dict:
+        with self._lock:
+            total, done = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(done), 0) FROM run_items WHERE run_id = ?", (run_id,)).fetchone()
+        return {"total": total, "done": done}
+
+    # ---- discover shards ----
+    def mark_shard(self, job: str, year: int, page: int, status: str, items: int = None, total_pages: int = None):
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO discover_shards (job, year, page, total_pages, items, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (job, year, page) DO UPDATE SET
+                    status = excluded.status,
+                    items = COALESCE(excluded.items, items),
+                    total_pages = COALESCE(excluded.total_pages, total_pages),
+                    updated_at = excluded.updated_at
+            """, (job, year, page, total_pages, items, status, time.time()))
+            self._db.commit()
+
+    def done_shards(self, job: str) -> Dict[Tuple[int, int], Optional[int]]:
+        """{(year, page): total_pages} của các shard đã hoàn tất trong job."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT year, page, total_pages FROM discover_shards WHERE job = ? AND status = 'done'", (job,)).fetchall()
+        return {(y, p): t for y, p, t in rows}
+
+    def shard_summary(self, job: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status FROM discover_shards WHERE job = ?", (job,)).fetchall()
+        return dict(Counter(r[0] for r in rows))
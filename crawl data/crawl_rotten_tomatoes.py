@@ -1,19 +1,27 @@
 """
 Cập nhật dữ liệu Rotten Tomatoes vào SQL Server
-Tìm kiếm phim dựa trên tên và cập nhật ratings
+Tìm kiếm phim theo slug RT đã biết (Movie_Crosswalk), chưa có thì theo tên (chỉ mục exact + trigram, có độ tin cậy)
+và cập nhật ratings
 Cập nhật trực tiếp critics_score và audience_score vào hàng IMDb/Metacritic
-Tự động tính mean và điền vào các giá trị NULL ngay trong CSDL
+Tự động tính mean và điền vào các giá trị NULL ngay trong CSDL (UPDATE theo tập, không kéo dữ liệu về Python)
+Crawl nhiều danh sách browse (phân trang, song song, bỏ trùng theo slug), phim được khớp ngay khi trang về
+Trang chi tiết phim (đồng thời, giới hạn tốc độ): số review, Certified Fresh, ngày phát hành -> RT_Details
+HTML thô mỗi lần crawl được lưu vào kho raw_archive; REPLAY=1 parse lại HTML đã lưu, không gọi Crawlbase
 
 VERSION: 3.0 (Logic mới: Cập nhật trực tiếp & Tự động điền Mean)
 """
 
-from crawlbase import CrawlingAPI
-from bs4 import BeautifulSoup
+import itertools
 import json
+import os
 import pyodbc
 from datetime import datetime
-import re
-import numpy as np 
+from raw_archive import RawArchive
+from sql_impute import impute_nulls
+from title_index import TitleIndex
+from crosswalk import Crosswalk, rt_slug
+from rt_browse import CrawlbaseFetcher, HttpFetcher, RTBrowseCrawler, item_key, parse_rt_browse
+from rt_details import RTDetailEnricher, RTDetailStore, ensure_table as ensure_rt_details_table
 
 # ======================
 # 🔑 CONFIG
@@ -22,6 +30,28 @@ CRAWLBASE_TOKEN = 'pWKGcx1K2GOVwYP75IVCvg'
 SQL_DRIVER = "ODBC Driver 17 for SQL Server"
 SQL_SERVER = "localhost"
 SQL_DATABASE = "XUHUONGPHIM"
+RT_BASE_URL = os.getenv("RT_BASE_URL", "https://www.rottentomatoes.com")
+RT_BROWSE_LISTS = os.getenv("RT_BROWSE_LISTS", ",".join([
+    "movies_in_theaters/sort:top_box_office",
+    "movies_at_home/sort:popular",
+    "movies_coming_soon/sort:popular",
+    "movies_at_home/genres:action",
+    "movies_at_home/genres:comedy",
+    "movies_at_home/genres:drama",
+    "movies_at_home/genres:horror",
+    "movies_at_home/genres:sci_fi",
+])).split(",")
+RT_MAX_PAGES = int(os.getenv("RT_MAX_PAGES", "20"))      # trang tối đa mỗi danh sách (dừng sớm khi hết phim mới)
+RT_CONCURRENCY = int(os.getenv("RT_CONCURRENCY", "4"))   # số request Crawlbase đồng thời
+RT_FETCHER = os.getenv("RT_FETCHER", "crawlbase")        # "crawlbase" hoặc "http"
+RT_PAGE_WAIT = os.getenv("RT_PAGE_WAIT", "3000")         # ms Crawlbase chờ trang render
+RT_DETAILS = os.getenv("RT_DETAILS", "1") == "1"                 # làm giàu từ trang chi tiết phim (RT_Details)
+RT_DETAIL_RATE = float(os.getenv("RT_DETAIL_RATE", "1"))          # request/giây tối đa cho trang chi tiết (tổng)
+RT_DETAIL_WORKERS = int(os.getenv("RT_DETAIL_WORKERS", "4"))      # số request trang chi tiết đồng thời
+RT_DETAIL_TTL_HOURS = float(os.getenv("RT_DETAIL_TTL_HOURS", "24"))  # trang kiểm tra trong vòng chừng này giờ thì không tải lại
+RAW_ARCHIVE_PATH = os.getenv("RAW_ARCHIVE_PATH", "raw_archive")   # dùng chung kho với crawl data.py
+REPLAY = os.getenv("REPLAY", "0") == "1"                          # parse lại HTML đã lưu thay vì crawl
+CROSSWALK_MIN_CONFIDENCE = float(os.getenv("CROSSWALK_MIN_CONFIDENCE", "0.95"))  # khớp theo tên từ mức này mới lưu slug
 
 # ======================
 # 🔌 DATABASE CONNECTION
@@ -38,88 +68,149 @@ def get_db_connection():
 # ======================
 # 🍅 CRAWL ROTTEN TOMATOES
 # ======================
-def fetch_rotten_tomatoes_data():
-    """Crawl dữ liệu từ Rotten Tomatoes"""
+def make_fetcher():
+    """Lớp fetch theo RT_FETCHER: 'crawlbase' (mặc định) hoặc 'http' (GET trực tiếp, vd server fixture khi test)"""
+    if RT_FETCHER == 'http':
+        return HttpFetcher()
+    return CrawlbaseFetcher(CRAWLBASE_TOKEN, {'ajax_wait': 'true', 'page_wait': RT_PAGE_WAIT})
+
+def fetch_rotten_tomatoes_data(archive=None, fetch=None):
+    """
+    Crawl nhiều danh sách browse RT (phân trang, nhiều request đồng thời), HTML thô được lưu vào archive nếu có.
+    Generator: mỗi phim (đã bỏ trùng theo slug) được yield ngay khi trang của nó về.
+    """
     print("\n" + "="*80)
-    print("🍅 CRAWLING ROTTEN TOMATOES")
+    print(f"🍅 CRAWLING ROTTEN TOMATOES: {len(RT_BROWSE_LISTS)} danh sách, tối đa {RT_MAX_PAGES} trang, "
+          f"{RT_CONCURRENCY} request đồng thời")
     print("="*80)
     
-    crawling_api = CrawlingAPI({'token': CRAWLBASE_TOKEN})
-    url = 'https://www.rottentomatoes.com/browse/movies_in_theaters/sort:top_box_office'
-    options = {
-        'ajax_wait': 'true',
-        'page_wait': '5000',
-        'css_click_selector': 'button[data-qa="dlp-load-more-button"]'
-    }
+    crawler = RTBrowseCrawler(fetch or make_fetcher(), RT_BROWSE_LISTS, max_pages=RT_MAX_PAGES,
+                              workers=RT_CONCURRENCY, base_url=RT_BASE_URL, archive=archive)
+    yield from crawler.stream()
+    stats = crawler.stats
+    print(f"✅ Đã lấy {stats['items']} phim từ {stats['pages']} trang Rotten Tomatoes "
+          f"({stats['duplicates']} trùng, {stats['failed']} trang lỗi)")
+
+def load_rotten_tomatoes_from_archive(archive):
+    """REPLAY: parse lại bản HTML mới nhất của mỗi trang browse đã lưu (bỏ trùng theo slug)"""
+    print("\n" + "="*80)
+    print(f"📦 REPLAY ROTTEN TOMATOES TỪ KHO '{archive.root}'")
+    print("="*80)
     
-    try:
-        response = crawling_api.get(url, options)
-        
-        if response.get('status_code') == 200:
-            print("✅ Crawl thành công!")
-            html_content = response['body'].decode('utf-8')
-            
-            soup = BeautifulSoup(html_content, 'html.parser')
-            movies = soup.select('div[data-qa="discovery-media-list"] > div.flex-container')
-            
-            movie_data = []
-            for movie in movies:
-                title_elem = movie.select_one('span[data-qa="discovery-media-list-item-title"]')
-                critics_elem = movie.select_one('rt-text[slot="criticsScore"]')
-                audience_elem = movie.select_one('rt-text[slot="audienceScore"]')
-                link_elem = movie.select_one('a[data-qa^="discovery-media-list-item"]')
-                
-                if title_elem:
-                    movie_data.append({
-                        'title': title_elem.text.strip(),
-                        'critics_score': critics_elem.text.strip() if critics_elem else None,
-                        'audience_score': audience_elem.text.strip() if audience_elem else None,
-                        'link': 'https://www.rottentomatoes.com' + link_elem['href'] if link_elem else None
-                    })
-            
-            print(f"✅ Đã lấy {len(movie_data)} phim từ Rotten Tomatoes")
-            return movie_data
-        else:
-            print(f"❌ Failed. Status code: {response.get('status_code')}")
-            return []
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return []
+    seen = set()
+    for url, html_content in archive.iter_latest('rt_html'):
+        items = parse_rt_browse(html_content, RT_BASE_URL)
+        print(f"✅ {url}: {len(items)} phim")
+        for item in items:
+            key = item_key(item)
+            if key not in seen:
+                seen.add(key)
+                yield dict(item, slug=rt_slug(item.get('link')))
 
 # ======================
 # 🔍 TÌM PHIM TRONG DATABASE
 # ======================
-def normalize_title(title):
-    """Chuẩn hóa tên phim để so sánh"""
-    normalized = re.sub(r'[^\w\s]', '', title.lower())
-    normalized = re.sub(r'\s+', ' ', normalized).strip()
-    return normalized
-
-def find_movie_in_db(db_movies, rt_movie):
+class MovieMatcher:
     """
-    Tìm phim trong danh sách db_movies (đã tải trước) dựa trên tên.
-    Không query CSDL trong hàm này.
+    Khớp phim RT với Movies: trước tiên theo slug URL qua Movie_Crosswalk (không cần so tên);
+    chỉ khi có phim chưa có ánh xạ mới tải Movies và dựng TitleIndex (một lần).
+    Khớp theo tên đủ tin cậy được ghi vào crosswalk để các lượt sau join thẳng theo slug.
     """
-    rt_title = rt_movie['title']
-    normalized_rt = normalize_title(rt_title)
-    
-    matches = []
-    for movie_id, db_title in db_movies:
-        normalized_db = normalize_title(db_title)
-        if normalized_rt == normalized_db:
-            return movie_id, db_title, "exact" # Ưu tiên exact match
-        if normalized_rt in normalized_db or normalized_db in normalized_rt:
-            matches.append((movie_id, db_title, "partial"))
-    
-    if matches:
-        return matches[0] # Lấy partial match đầu tiên
-    
-    return None, None, None
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.crosswalk = Crosswalk().load(cursor)
+        self._index = None
+        self._years = None
+        print(f"✅ Đã tải {len(self.crosswalk.ids)} ánh xạ id từ Movie_Crosswalk.")
+
+    def title_index(self):
+        if self._index is None:
+            print("Đang tải danh sách phim từ CSDL...")
+            self.cursor.execute("SELECT movie_id, title, YEAR(release_date) FROM Movies WHERE title IS NOT NULL")
+            self._index = TitleIndex(self.cursor.fetchall())
+            print(f"✅ Đã tải và lập chỉ mục {len(self._index)} phim.")
+        return self._index
+
+    def detail_year(self, slug):
+        """Năm phát hành từ trang chi tiết đã crawl (RT_Details) khi ô browse không ghi ngày."""
+        if self._years is None:
+            self.cursor.execute("""
+                IF OBJECT_ID(N'RT_Details', N'U') IS NOT NULL
+                    SELECT rt_slug, release_year FROM RT_Details WHERE release_year IS NOT NULL
+                ELSE
+                    SELECT CAST(NULL AS NVARCHAR(255)), CAST(NULL AS INT) WHERE 1 = 0
+            """)
+            self._years = dict(self.cursor.fetchall())
+        return self._years.get(slug)
+
+    def match(self, rt_movie):
+        """Trả về (movie_id, db_title, match_type, confidence); không khớp thì (None, None, None, 0.0)."""
+        slug = rt_slug(rt_movie.get('link'))
+        movie_id = self.crosswalk.movie_id('rt', slug)
+        if movie_id:
+            return movie_id, None, "crosswalk", 1.0
+        # năm dùng để phân xử phim trùng tên (remake): từ ô browse, không có thì từ RT_Details
+        year = rt_movie.get('year') or (self.detail_year(slug) if slug else None)
+        found = self.title_index().lookup(rt_movie['title'], year)
+        if found is None:
+            return None, None, None, 0.0
+        if slug and found.confidence >= CROSSWALK_MIN_CONFIDENCE:
+            self.crosswalk.remember('rt', slug, found.movie_id, found.match_type, found.confidence)
+        return found.movie_id, found.title, found.match_type, found.confidence
+
+    def save(self):
+        """Ghi các ánh xạ mới vào Movie_Crosswalk (cùng transaction với cập nhật ratings)."""
+        return self.crosswalk.flush(self.cursor)
 
 # ======================
 # 💾 CẬP NHẬT RATINGS (LOGIC MỚI VÀ TỰ ĐỘNG FILL MEAN)
 # ======================
+def parse_score(value):
+    """'85%' -> 85.0; rỗng / không hợp lệ -> None"""
+    if not value:
+        return None
+    try:
+        return float(value.replace('%', ''))
+    except ValueError:
+        return None
+
+def apply_rt_scores(cursor, rows):
+    """
+    Ghi điểm RT (movie_id, critics, audience) theo tập: nạp vào #rt_scores bằng fast_executemany,
+    một UPDATE ... FROM vào hàng 'IMDb' & 'Metacritic' (điểm NULL giữ nguyên giá trị cũ).
+    Trả về {movie_id: (critics_updated, audience_updated)} lấy từ OUTPUT của chính câu UPDATE.
+    """
+    if not rows:
+        return {}
+    cursor.execute("""
+        CREATE TABLE #rt_scores (
+            movie_id NVARCHAR(50) PRIMARY KEY,
+            critics_score FLOAT NULL,
+            audience_score FLOAT NULL
+        )
+    """)
+    cursor.fast_executemany = True
+    cursor.executemany("INSERT INTO #rt_scores (movie_id, critics_score, audience_score) VALUES (?, ?, ?)", rows)
+    cursor.fast_executemany = False
+    cursor.execute("""
+        UPDATE r
+        SET critics_score = COALESCE(s.critics_score, r.critics_score),
+            audience_score = COALESCE(s.audience_score, r.audience_score),
+            last_updated = GETDATE()
+        OUTPUT inserted.movie_id,
+               CASE WHEN s.critics_score IS NOT NULL THEN 1 ELSE 0 END,
+               CASE WHEN s.audience_score IS NOT NULL THEN 1 ELSE 0 END
+        FROM Ratings r
+        JOIN #rt_scores s ON s.movie_id = r.movie_id
+        WHERE r.source_name IN ('IMDb', 'Metacritic')
+    """)
+    updated = {}
+    for movie_id, critics, audience in cursor.fetchall():
+        updated[movie_id] = (bool(critics), bool(audience))
+    cursor.execute("DROP TABLE #rt_scores")
+    return updated
+
 def update_ratings(rt_data):
     """
     Cập nhật ratings vào database.
@@ -135,86 +226,64 @@ def update_ratings(rt_data):
     cursor = conn.cursor()
     
     stats = {
-        'exact_match': 0, 'partial_match': 0, 'no_match': 0,
+        'crosswalk_match': 0, 'exact_match': 0, 'fuzzy_match': 0, 'no_match': 0,
         'updated_critics': 0, 'updated_audience': 0
     }
     
-    # === TỐI ƯU HÓA: LẤY DỮ LIỆU 1 LẦN ===
-    print("Đang tải danh sách phim từ CSDL...")
-    cursor.execute("SELECT movie_id, title FROM Movies")
-    db_movies = cursor.fetchall()
-    print(f"✅ Đã tải {len(db_movies)} phim.")
+    # === TỐI ƯU HÓA: LẤY DỮ LIỆU 1 LẦN (crosswalk; danh sách phim chỉ khi cần khớp theo tên) ===
+    matcher = MovieMatcher(cursor)
     
     results = []
+    scores = {}
     
     try:
         # ================================================
-        # VÒNG LẶP 1: CẬP NHẬT PHIM CRAWL TỪ ROTTEN TOMATOES
+        # VÒNG LẶP 1: KHỚP PHIM CRAWL TỪ ROTTEN TOMATOES, GOM ĐIỂM
         # ================================================
         for rt_movie in rt_data:
-            movie_id, db_title, match_type = find_movie_in_db(db_movies, rt_movie)
+            movie_id, db_title, match_type, confidence = matcher.match(rt_movie)
             
             result = {
-                'rt_title': rt_movie['title'], 'db_title': db_title,
-                'movie_id': movie_id, 'match_type': match_type,
+                'rt_title': rt_movie['title'], 'rt_slug': rt_slug(rt_movie.get('link')), 'db_title': db_title,
+                'movie_id': movie_id, 'match_type': match_type, 'confidence': confidence,
                 'critics_updated': False, 'audience_updated': False
             }
             
             if movie_id:
-                if match_type == "exact":
+                if match_type == "crosswalk":
+                    stats['crosswalk_match'] += 1
+                    print(f"\n🔗 CROSSWALK: '{rt_movie['title']}'")
+                elif match_type == "exact":
                     stats['exact_match'] += 1
                     print(f"\n✅ EXACT MATCH: '{rt_movie['title']}'")
                 else:
-                    stats['partial_match'] += 1
-                    print(f"\n⚠️ PARTIAL MATCH:")
+                    stats['fuzzy_match'] += 1
+                    print(f"\n⚠️ FUZZY MATCH (độ tin cậy {confidence:.2f}):")
                     print(f"    RT: '{rt_movie['title']}'")
                     print(f"    DB: '{db_title}'")
                 
                 print(f"    Movie ID: {movie_id}")
-                
-                # Critics Score
-                if rt_movie['critics_score']:
-                    try:
-                        score = float(rt_movie['critics_score'].replace('%', ''))
-                        cursor.execute("""
-                            UPDATE Ratings 
-                            SET critics_score = ?, last_updated = GETDATE()
-                            WHERE movie_id = ? 
-                              AND source_name IN ('IMDb', 'Metacritic')
-                        """, score, movie_id)
-                        
-                        if cursor.rowcount > 0:
-                            stats['updated_critics'] += 1
-                            result['critics_updated'] = True
-                            print(f"    -> Đã cập nhật critics_score = {score} cho 'IMDb'/'Metacritic'")
-                        
-                    except Exception as e:
-                        print(f"    ❌ Error updating critics score: {e}")
-                
-                # Audience Score
-                if rt_movie['audience_score']:
-                    try:
-                        score = float(rt_movie['audience_score'].replace('%', ''))
-                        cursor.execute("""
-                            UPDATE Ratings 
-                            SET audience_score = ?, last_updated = GETDATE()
-                            WHERE movie_id = ? 
-                              AND source_name IN ('IMDb', 'Metacritic')
-                        """, score, movie_id)
-                        
-                        if cursor.rowcount > 0:
-                            stats['updated_audience'] += 1
-                            result['audience_updated'] = True
-                            print(f"    -> Đã cập nhật audience_score = {score} cho 'IMDb'/'Metacritic'")
-
-                    except Exception as e:
-                        print(f"    ❌ Error updating audience score: {e}")
+                critics = parse_score(rt_movie['critics_score'])
+                audience = parse_score(rt_movie['audience_score'])
+                if critics is not None or audience is not None:
+                    # phim khớp nhiều tên RT: giữ điểm của tên sau cùng (như thứ tự UPDATE cũ)
+                    scores[movie_id] = (movie_id, critics, audience)
             else:
                 stats['no_match'] += 1
                 print(f"\n❌ NO MATCH: '{rt_movie['title']}'")
             
             results.append(result)
         
+        # Ghi toàn bộ điểm một lần: bảng tạm + một UPDATE ... FROM (số round trip không phụ thuộc số phim)
+        updated = apply_rt_scores(cursor, list(scores.values()))
+        for result in results:
+            flags = updated.get(result['movie_id'])
+            if flags:
+                result['critics_updated'], result['audience_updated'] = flags
+        stats['updated_critics'] = sum(1 for c, _ in updated.values() if c)
+        stats['updated_audience'] = sum(1 for _, a in updated.values() if a)
+        print(f"\n🍅 Đã cập nhật điểm RT cho {len(updated)} phim (hàng 'IMDb'/'Metacritic') bằng một câu UPDATE")
+        
         # === KẾT THÚC VÒNG LẶP 1 ===
 
         # ================================================
@@ -224,41 +293,11 @@ def update_ratings(rt_data):
         print("📊 ĐANG TÍNH TOÁN MEAN VÀ CẬP NHẬT CÁC HÀNG CÒN LẠI...")
         
         try:
-            # 1. Lấy TẤT CẢ điểm đã có để tính mean
-            cursor.execute("""
-                SELECT critics_score, audience_score 
-                FROM Ratings 
-                WHERE source_name IN ('IMDb', 'Metacritic')
-            """)
-            all_scores = cursor.fetchall()
-
-            rt_c_scores = np.array([r[0] for r in all_scores if r[0] is not None])
-            rt_a_scores = np.array([r[1] for r in all_scores if r[1] is not None])
-
-            mean_rt_c = np.mean(rt_c_scores) if rt_c_scores.size > 0 else 0
-            mean_rt_a = np.mean(rt_a_scores) if rt_a_scores.size > 0 else 0
-
-            print(f"📈 Mean tính được: Critics = {mean_rt_c:.1f}, Audience = {mean_rt_a:.1f}")
-
-            # 2. Cập nhật critics_score cho các hàng BỊ NULL
-            if mean_rt_c > 0:
-                cursor.execute("""
-                    UPDATE Ratings
-                    SET critics_score = ?
-                    WHERE critics_score IS NULL
-                      AND source_name IN ('IMDb', 'Metacritic')
-                """, mean_rt_c)
-                print(f"✅ Đã cập nhật {cursor.rowcount} hàng (critics_score) bị NULL bằng mean.")
-
-            # 3. Cập nhật audience_score cho các hàng BỊ NULL
-            if mean_rt_a > 0:
-                cursor.execute("""
-                    UPDATE Ratings
-                    SET audience_score = ?
-                    WHERE audience_score IS NULL
-                      AND source_name IN ('IMDb', 'Metacritic')
-                """, mean_rt_a)
-                print(f"✅ Đã cập nhật {cursor.rowcount} hàng (audience_score) bị NULL bằng mean.")
+            # Mean tính và điền ngay trong SQL Server (một UPDATE theo tập mỗi cột), không kéo điểm về Python
+            filled = impute_nulls(cursor, "Ratings", ["critics_score", "audience_score"], strategy="mean",
+                                  where="source_name IN ('IMDb', 'Metacritic')")
+            print(f"✅ Đã cập nhật {filled['critics_score']} hàng (critics_score) bị NULL bằng mean.")
+            print(f"✅ Đã cập nhật {filled['audience_score']} hàng (audience_score) bị NULL bằng mean.")
             
             print(f"✅ Hoàn tất điền NULL bằng mean.")
 
@@ -270,11 +309,14 @@ def update_ratings(rt_data):
         # ================================================
         # COMMIT VÀ IN THỐNG KÊ
         # ================================================
+        saved = matcher.save()
         conn.commit()
+        print(f"🔗 Đã lưu {saved} ánh xạ slug RT mới vào Movie_Crosswalk")
         
         print("\n📊 THỐNG KÊ CẬP NHẬT (TỪ CRAWL)")
+        print(f"🔗 Crosswalk Match: {stats['crosswalk_match']}")
         print(f"✅ Exact Match: {stats['exact_match']}")
-        print(f"⚠️ Partial Match: {stats['partial_match']}")
+        print(f"⚠️ Fuzzy Match: {stats['fuzzy_match']}")
         print(f"❌ No Match: {stats['no_match']}")
         print(f"🍅 Critics Score Updated: {stats['updated_critics']}")
         print(f"🍅 Audience Score Updated: {stats['updated_audience']}")
@@ -287,6 +329,53 @@ def update_ratings(rt_data):
     
     return results, stats
 
+# ======================
+# 🔎 LÀM GIÀU TỪ TRANG CHI TIẾT PHIM
+# ======================
+def enrich_rt_details(rt_data, results, archive):
+    """
+    Tải trang chi tiết của các phim vừa crawl (đồng thời, giới hạn RT_DETAIL_RATE request/giây),
+    lưu số review, Certified Fresh, ngày phát hành vào RT_Details. Trang đã kiểm tra trong vòng RT_DETAIL_TTL_HOURS
+    không tải lại; trang tải lại mà không đổi từ lượt trước chỉ cập nhật checked_at.
+    REPLAY: đọc HTML trang chi tiết đã lưu trong kho thay vì tải lại.
+    """
+    print("\n" + "="*80)
+    print(f"🔎 LÀM GIÀU TỪ TRANG CHI TIẾT RT ({RT_DETAIL_WORKERS} request đồng thời, tối đa {RT_DETAIL_RATE:g} request/giây)")
+    print("="*80)
+    
+    jobs = {}
+    for rt_movie, result in zip(rt_data, results):
+        slug = result['rt_slug']
+        if slug and rt_movie.get('link'):
+            jobs[slug] = (slug, rt_movie['link'], result['movie_id'])
+    if not jobs:
+        print("⚠️ Không có link trang chi tiết nào")
+        return {}
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        ensure_rt_details_table(cursor)
+        store = RTDetailStore().load(cursor, ttl_hours=0 if REPLAY else RT_DETAIL_TTL_HOURS)
+        fetch = (lambda url: archive.latest('rt_detail_html', url)) if REPLAY else make_fetcher()
+        enricher = RTDetailEnricher(fetch, store, rate=RT_DETAIL_RATE, workers=RT_DETAIL_WORKERS,
+                                    archive=None if REPLAY else archive)
+        changed, checked, relinked, details = enricher.run(jobs.values())
+        store.save(cursor, changed, checked, relinked)
+        conn.commit()
+        stats = enricher.stats
+        print(f"⏭️ {stats['fresh']} trang đã kiểm tra trong {RT_DETAIL_TTL_HOURS:g} giờ qua: không tải lại")
+        print(f"✅ {stats['fetched']} trang: {stats['changed']} mới / thay đổi, {stats['unchanged']} không đổi, "
+              f"{stats['failed']} lỗi")
+        print(f"🍅 Certified Fresh: {sum(1 for d in details.values() if d['certified_fresh'])}")
+        return stats
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Error: {e}")
+        return {}
+    finally:
+        conn.close()
+
 # ======================
 # 📊 TRỰC QUAN HÓA DỮ LIỆU (ĐÃ ĐƠN GIẢN HÓA)
 # ======================
@@ -349,17 +438,29 @@ def visualize_data():
 # 🚀 MAIN
 # ======================
 def main():
-    rt_data = fetch_rotten_tomatoes_data()
-    if not rt_data:
-        print("❌ Không có dữ liệu để cập nhật")
-        return
+    archive = RawArchive(RAW_ARCHIVE_PATH)
+    try:
+        rt_stream = load_rotten_tomatoes_from_archive(archive) if REPLAY else fetch_rotten_tomatoes_data(archive)
+        first = next(rt_stream, None)
+        if first is None:
+            print("❌ Không có dữ liệu để cập nhật")
+            return
+        # phim được khớp ngay khi crawl về; giữ lại bản sao để ghi rt_raw_data.json
+        rt_data = []
+        def collect():
+            for item in itertools.chain([first], rt_stream):
+                rt_data.append(item)
+                yield item
+        results, stats = update_ratings(collect())
+        if RT_DETAILS:
+            stats['details'] = enrich_rt_details(rt_data, results, archive)
+    finally:
+        archive.close()
     
     with open('rt_raw_data.json', 'w', encoding='utf-8') as f:
         json.dump(rt_data, f, indent=4, ensure_ascii=False)
     print(f"\n💾 Đã lưu raw data vào 'rt_raw_data.json'")
     
-    results, stats = update_ratings(rt_data)
-    
     with open('rt_update_results.json', 'w', encoding='utf-8') as f:
         json.dump({
             'stats': stats,
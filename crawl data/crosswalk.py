@@ -0,0 +1,137 @@
+"""
+crosswalk.py
+
+Bảng nối id giữa các nguồn (Movie_Crosswalk, sql/SQLQuery1.sql): (nguồn, khóa của nguồn) -> movie_id
+- movie_id theo quy ước của crawler: IMDb id, không có thì tmdb_{id}
+- Nguồn: 'tmdb' (TMDb id), 'imdb' (IMDb id - cũng là khóa OMDb i=), 'rt' (slug URL Rotten Tomatoes)
+- Nạp một lần vào bộ nhớ; khớp mới (vd RT khớp theo tên) được ghi lại, các lượt sau join thẳng theo khóa
+- 'tmdb' / 'imdb' được đồng bộ từ Movies bằng một MERGE theo tập
+- Job chạy trên database khác (FINAL CODE.py) dùng chung bảng của crawler qua tên đầy đủ, vd XUHUONGPHIM.dbo.Movie_Crosswalk
+"""
+
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+MAX_PARAMS = 2000
+CROSSWALK_TABLE = "Movie_Crosswalk"
+
+CROSSWALK_DDL = """
+IF OBJECT_ID(N'{table}', N'U') IS NULL
+CREATE TABLE {table} (
+    source NVARCHAR(20) NOT NULL,
+    source_key NVARCHAR(255) NOT NULL,
+    movie_id NVARCHAR(50) NOT NULL,
+    match_type NVARCHAR(20),
+    confidence FLOAT,
+    updated_at DATETIME DEFAULT GETDATE(),
+    PRIMARY KEY (source, source_key)
+);
+"""
+
+SYNC_FROM_MOVIES_SQL = """
+MERGE {table} WITH (HOLDLOCK) AS t
+USING (
+    SELECT 'tmdb' AS source, CAST(tmdb_id AS NVARCHAR(255)) AS source_key, movie_id FROM Movies WHERE tmdb_id IS NOT NULL
+    UNION ALL
+    SELECT 'imdb', movie_id, movie_id FROM Movies WHERE movie_id LIKE 'tt%'
+) AS s ON t.source = s.source AND t.source_key = s.source_key
+WHEN MATCHED AND t.movie_id <> s.movie_id THEN
+    UPDATE SET movie_id = s.movie_id, match_type = 'id', confidence = 1.0, updated_at = GETDATE()
+WHEN NOT MATCHED THEN
+    INSERT (source, source_key, movie_id, match_type, confidence) VALUES (s.source, s.source_key, s.movie_id, 'id', 1.0);
+"""
+
+
+def ensure_table(cursor, table: str = CROSSWALK_TABLE):
+    """Tạo Movie_Crosswalk nếu chưa có (database không dựng từ sql/SQLQuery1.sql). `table` có thể là tên đầy đủ db.schema.bảng."""
+    cursor.execute(CROSSWALK_DDL.format(table=table))
+
+
+def rt_slug(link: Optional[str]) -> Optional[str]:
+    """'https://www.rottentomatoes.com/m/dune_part_two' -> 'dune_part_two'."""
+    if not link:
+        return None
+    m = re.search(r"/m/([^/?#]+)", link)
+    return m.group(1).lower() if m else None
+
+
+class Crosswalk:
+    def __init__(self, table: str = CROSSWALK_TABLE):
+        self.table = table
+        self._lock = threading.Lock()
+        self.ids: Dict[Tuple[str, str], str] = {}
+        self.keys: Dict[str, Dict[str, str]] = {}
+        self._pending: List[Tuple[str, str, str, str, float]] = []
+        self.hits = 0
+        self.added = 0
+
+    def load(self, cursor):
+        cursor.execute(f"SELECT source, source_key, movie_id FROM {self.table}")
+        for source, key, movie_id in cursor.fetchall():
+            self._set(source, key, movie_id)
+        return self
+
+    def _set(self, source: str, key: str, movie_id: str):
+        self.ids[(source, key)] = movie_id
+        self.keys.setdefault(movie_id, {})[source] = key
+
+    def sync_from_movies(self, cursor) -> int:
+        """Thêm / sửa ánh xạ 'tmdb' và 'imdb' của mọi phim trong Movies (không commit). Trả về số dòng đổi."""
+        cursor.execute(SYNC_FROM_MOVIES_SQL.format(table=self.table))
+        return cursor.rowcount
+
+    def movie_id(self, source: str, key) -> Optional[str]:
+        if key is None:
+            return None
+        movie_id = self.ids.get((source, str(key)))
+        if movie_id is not None:
+            self.hits += 1
+        return movie_id
+
+    def key_for(self, movie_id: Optional[str], source: str) -> Optional[str]:
+        return self.keys.get(movie_id, {}).get(source) if movie_id else None
+
+    def remember(self, source: str, key, movie_id: str, match_type: str = "id", confidence: float = 1.0):
+        """Ghi nhận ánh xạ mới (vào bộ nhớ ngay, vào DB khi flush)."""
+        if key is None or not movie_id:
+            return
+        key = str(key)
+        with self._lock:
+            if self.ids.get((source, key)) == movie_id:
+                return
+            self._set(source, key, movie_id)
+            self._pending.append((source, key, movie_id, match_type, confidence))
+
+    def forget(self, source: str, key) -> None:
+        """Bỏ một ánh xạ đã remember (vd dòng phim của nó bị rollback): xóa khỏi bộ nhớ và hàng chờ flush."""
+        key = str(key)
+        with self._lock:
+            movie_id = self.ids.pop((source, key), None)
+            if movie_id is not None and self.keys.get(movie_id, {}).get(source) == key:
+                del self.keys[movie_id][source]
+            self._pending = [r for r in self._pending if (r[0], r[1]) != (source, key)]
+
+    def flush(self, cursor) -> int:
+        """MERGE các ánh xạ mới vào Movie_Crosswalk (không commit)."""
+        with self._lock:
+            rows, self._pending = list({(r[0], r[1]): r for r in self._pending}.values()), []
+        per_stmt = MAX_PARAMS // 5
+        for i in range(0, len(rows), per_stmt):
+            chunk = rows[i:i + per_stmt]
+            cursor.execute(f"""
+                MERGE {self.table} WITH (HOLDLOCK) AS t
+                USING (VALUES {", ".join("(?, ?, ?, ?, ?)" for _ in chunk)})
+                    AS s (source, source_key, movie_id, match_type, confidence)
+                    ON t.source = s.source AND t.source_key = s.source_key
+                WHEN MATCHED THEN UPDATE SET movie_id = s.movie_id, match_type = s.match_type,
+                    confidence = s.confidence, updated_at = GETDATE()
+                WHEN NOT MATCHED THEN INSERT (source, source_key, movie_id, match_type, confidence)
+                    VALUES (s.source, s.source_key, s.movie_id, s.match_type, s.confidence);
+            """, *[v for row in chunk for v in row])
+        self.added += len(rows)
+        return len(rows)
+
+    def log_stats(self, label: str = "Crosswalk"):
+        logging.info("%s: %d mappings, %d key hits, %d new mappings saved", label, len(self.ids), self.hits, self.added)
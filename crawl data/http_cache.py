@@ -0,0 +1,132 @@
+"""
+http_cache.py
+
+Cache response HTTP lưu trên đĩa (SQLite) dùng chung giữa các lần chạy crawler:
+- Key = URL chuẩn hóa + params đã sắp xếp, BỎ các tham số bí mật (api_key, apikey, token)
+- TTL theo từng endpoint (do caller truyền vào), hết hạn thì revalidate bằng ETag / Last-Modified
+- Giới hạn dung lượng, loại bỏ theo LRU (last_access)
+- Bộ đếm hit / miss / revalidated để đo hiệu quả
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+SECRET_PARAMS = {"api_key", "apikey", "token", "access_token"}
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def make_cache_key(url: str, params: dict = None) -> str:
+    """URL + params -> key ổn định, không chứa API key."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query += [(k, str(v)) for k, v in (params or {}).items() if v is not None]
+    query = sorted((k, v) for k, v in query if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(query), ""))
+
+
+class ResponseCache:
+    def __init__(self, path: str, max_bytes: int = 200 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stored = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                status INTEGER,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB,
+                size INTEGER,
+                expires_at REAL,
+                last_access REAL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_access ON responses(last_access)")
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[dict]:
+        """Trả về entry (kể cả đã hết hạn, để revalidate) hoặc None. entry["fresh"] cho biết còn TTL không."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, content_type, etag, last_modified, body, expires_at FROM responses WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            fresh = row[5] > now
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return {
+                "status": row[0], "headers": {"Content-Type": row[1], "ETag": row[2], "Last-Modified": row[3]},
+                "etag": row[2], "last_modified": row[3], "body": row[4], "fresh": fresh,
+            }
+
+    def put(self, key: str, status: int, headers, body: bytes, ttl: float):
+        now = time.time()
+        headers = headers or {}
+        values = [headers.get(h) for h in KEPT_HEADERS]
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, status, content_type, etag, last_modified, body, size, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, status, *values, body, len(body), now + ttl, now))
+            self._size += len(body) - (old[0] if old else 0)
+            self.stored += 1
+            if self._size > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def refresh(self, key: str, ttl: float):
+        """Server trả 304 Not Modified: gia hạn TTL cho entry hiện có."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET expires_at = ?, last_access = ? WHERE key = ?", (now + ttl, now, key))
+            self._db.commit()
+            self.revalidated += 1
+
+    def _evict(self):
+        # LRU: xóa các entry ít được truy cập nhất tới khi còn ~90% giới hạn
+        target = self.max_bytes * 0.9
+        while self._size > target:
+            rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 100").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                self.evicted += 1
+                if self._size <= target:
+                    break
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "revalidated": self.revalidated, "stored": self.stored,
+            "evicted": self.evicted, "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "size_mb": round(self._size / 1024 / 1024, 2),
+        }
+
+    def log_stats(self):
+        logging.info("HTTP cache %s: %s", self.path, self.stats())
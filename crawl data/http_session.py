@@ -0,0 +1,73 @@
+"""
+http_session.py
+
+Session HTTP dùng chung cho mọi helper crawler (crawl data.py, FINAL CODE.py, ...):
+- Mỗi host một requests.Session với connection pool riêng (kích thước cấu hình được)
+- Keep-alive: tái sử dụng kết nối TCP+TLS thay vì mở mới cho từng request
+- Gzip trong suốt (Accept-Encoding, requests tự giải nén)
+- Bộ đếm kết nối tạo mới / tái sử dụng để đo hiệu quả
+"""
+
+import logging
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    def __init__(self, pool_sizes: Dict[str, int] = None, default_pool_size: int = 10, keep_alive: bool = True):
+        self.pool_sizes = dict(pool_sizes or {})
+        self.default_pool_size = default_pool_size
+        self.keep_alive = keep_alive
+        self.sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def session(self, host: str) -> requests.Session:
+        with self._lock:
+            s = self.sessions.get(host)
+            if s is None:
+                size = self.pool_sizes.get(host, self.default_pool_size)
+                # max_retries=0: retry/backoff do safe_get + rate limiter đảm nhiệm
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=size, max_retries=0)
+                s = requests.Session()
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                s.headers["Accept-Encoding"] = "gzip, deflate"
+                s.headers["Connection"] = "keep-alive" if self.keep_alive else "close"
+                self.sessions[host] = s
+            return s
+
+    def get(self, url: str, host: Optional[str] = None, **kwargs) -> requests.Response:
+        return self.session(host or urlparse(url).netloc).get(url, **kwargs)
+
+    def stats(self) -> dict:
+        """Số kết nối đã tạo và số request chạy trên kết nối tái sử dụng (theo từng host)."""
+        result = {}
+        with self._lock:
+            sessions = list(self.sessions.items())
+        for host, s in sessions:
+            created = requests_sent = 0
+            for adapter in set(s.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    created += pool.num_connections
+                    requests_sent += pool.num_requests
+            result[host] = {"created": created, "reused": max(0, requests_sent - created), "requests": requests_sent}
+        return result
+
+    def log_stats(self):
+        for host, st in sorted(self.stats().items()):
+            logging.info("HTTP session [%s]: connections created=%d, reused=%d, requests=%d",
+                         host, st["created"], st["reused"], st["requests"])
+
+    def close(self):
+        with self._lock:
+            for s in self.sessions.values():
+                s.close()
+            self.sessions.clear()
@@ -0,0 +1,42 @@
+"""
+movie_record.py
+
+Bản ghi gọn của một phim, rút ra ngay khi parse payload TMDb/OMDb:
+- Chỉ giữ các trường được ghi vào DB (đạo diễn + top 5 cast, không giữ cả danh sách cast/crew)
+- __slots__ (không có __dict__ cho mỗi phim), cast/genres là tuple
+- Fetcher và writer chỉ trao đổi MovieRecord, payload JSON gốc được giải phóng ngay sau khi parse,
+  nên bộ nhớ cho các phim đang xử lý không phụ thuộc kích thước response
+"""
+
+from datetime import date
+from typing import Optional, Tuple
+
+
+class MovieRecord:
+    __slots__ = ("movie_id", "tmdb_id", "title", "release_date", "country", "language", "director",
+                 "cast", "genres", "budget", "revenue", "imdb_rating", "imdb_votes")
+
+    def __init__(self, movie_id: str, tmdb_id: Optional[int], title: Optional[str],
+                 release_date: Optional[date] = None, country: Optional[str] = None, language: Optional[str] = None,
+                 director: Optional[str] = None, cast: Tuple[str, ...] = (), genres: Tuple[str, ...] = (),
+                 budget: Optional[int] = None, revenue: Optional[int] = None,
+                 imdb_rating: Optional[float] = None, imdb_votes: Optional[int] = None):
+        self.movie_id = movie_id
+        self.tmdb_id = tmdb_id
+        self.title = title
+        self.release_date = release_date
+        self.country = country
+        self.language = language
+        self.director = director
+        self.cast = tuple(cast)
+        self.genres = tuple(genres)
+        self.budget = budget
+        self.revenue = revenue
+        self.imdb_rating = imdb_rating
+        self.imdb_votes = imdb_votes
+
+    def as_dict(self) -> dict:
+        return {f: getattr(self, f) for f in self.__slots__}
+
+    def __repr__(self):
+        return f"MovieRecord({self.movie_id!r}, {self.title!r})"
@@ -0,0 +1,124 @@
+"""
+payload_hash.py
+
+Phát hiện thay đổi theo nội dung để bỏ qua ghi DB khi dữ liệu nguồn không đổi:
+- Mỗi phim, mỗi nguồn (tmdb / omdb) một hash SHA-256 trên payload đã chuẩn hóa (MovieRecord)
+- Hash lưu ở bảng Movie_Payload_Hash (sql/SQLQuery1.sql), nạp một lần vào bộ nhớ khi mở writer
+- Writer chỉ ghi các nguồn có hash đổi; phim không đổi chỉ được đánh dấu checked_at theo lô
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from movie_record import MovieRecord
+
+# Trường của MovieRecord thuộc từng nguồn (Streaming_Popularity là dữ liệu giả, không tính)
+HASH_SOURCES = {
+    "tmdb": ("tmdb_id", "title", "release_date", "country", "language", "director", "cast", "genres",
+             "budget", "revenue"),
+    "omdb": ("imdb_rating", "imdb_votes"),
+}
+MAX_PARAMS = 1000
+
+
+def payload_hashes(rec: MovieRecord) -> Dict[str, bytes]:
+    """{nguồn: sha256} trên các trường của nguồn đó (JSON sắp xếp khóa, ngày -> ISO, tuple như list)."""
+    result = {}
+    for source, fields in HASH_SOURCES.items():
+        payload = json.dumps({f: getattr(rec, f) for f in fields}, sort_keys=True, ensure_ascii=False, default=str)
+        result[source] = hashlib.sha256(payload.encode("utf-8")).digest()
+    return result
+
+
+class PayloadHashStore:
+    """
+    Map (movie_id, nguồn) -> hash đã lưu. Cùng giao diện savepoint / commit / rollback với NameIdCache
+    để hash trong bộ nhớ khớp với những gì thực sự đã commit.
+    """
+
+    def __init__(self):
+        self.hashes: Dict[Tuple[str, str], bytes] = {}
+        self._since_savepoint: Dict[Tuple[str, str], Optional[bytes]] = {}
+        self._since_commit: Dict[Tuple[str, str], Optional[bytes]] = {}
+        self.written = {source: 0 for source in HASH_SOURCES}
+        self.skipped = 0
+        self._checked: List[str] = []   # phim không đổi chờ cập nhật checked_at
+
+    def load(self, cursor):
+        cursor.execute("SELECT movie_id, source, payload_hash FROM Movie_Payload_Hash")
+        for movie_id, source, digest in cursor.fetchall():
+            self.hashes[(movie_id, source)] = bytes(digest)
+        return self
+
+    def changed(self, movie_id: str, hashes: Dict[str, bytes]) -> Set[str]:
+        """Các nguồn có hash khác (hoặc chưa có) so với bản đã lưu."""
+        return {source for source, digest in hashes.items() if self.hashes.get((movie_id, source)) != digest}
+
+    def mark_unchanged(self, movie_id: str):
+        self.skipped += 1
+        self._checked.append(movie_id)
+
+    def save(self, cursor, movie_id: str, hashes: Dict[str, bytes], sources: Iterable[str]):
+        """Ghi hash của các nguồn vừa được ghi (trong transaction hiện tại của cursor)."""
+        rows = [(movie_id, source, hashes[source]) for source in sources]
+        if not rows:
+            return
+        values = ", ".join("(?, ?, ?)" for _ in rows)
+        cursor.execute(f"""
+            MERGE Movie_Payload_Hash AS t
+            USING (VALUES {values}) AS s (movie_id, source, payload_hash)
+                ON t.movie_id = s.movie_id AND t.source = s.source
+            WHEN MATCHED THEN UPDATE SET payload_hash = s.payload_hash, checked_at = GETDATE(), updated_at = GETDATE()
+            WHEN NOT MATCHED THEN INSERT (movie_id, source, payload_hash) VALUES (s.movie_id, s.source, s.payload_hash);
+        """, *[v for row in rows for v in row])
+        self.remember(rows)
+
+    def remember(self, rows: Iterable[Tuple[str, str, bytes]]):
+        """Cập nhật hash trong bộ nhớ (hoàn tác được tới savepoint / commit gần nhất)."""
+        for movie_id, source, digest in rows:
+            key = (movie_id, source)
+            self._since_savepoint.setdefault(key, self.hashes.get(key))
+            self.hashes[key] = digest
+
+    def touch_checked(self, cursor):
+        """Một UPDATE theo lô: ghi nhận các phim không đổi đã được kiểm tra (mốc độ cũ cho scheduler)."""
+        ids, self._checked = list(dict.fromkeys(self._checked)), []
+        for i in range(0, len(ids), MAX_PARAMS):
+            chunk = ids[i:i + MAX_PARAMS]
+            cursor.execute(f"UPDATE Movie_Payload_Hash SET checked_at = GETDATE() WHERE movie_id IN ({', '.join('?' for _ in chunk)})",
+                           *chunk)
+
+    def savepoint(self):
+        for key, old in self._since_savepoint.items():
+            self._since_commit.setdefault(key, old)
+        self._since_savepoint = {}
+
+    def rollback_to_savepoint(self):
+        self._restore(self._since_savepoint)
+        self._since_savepoint = {}
+
+    def commit(self):
+        for _, source in set(self._since_commit) | set(self._since_savepoint):
+            self.written[source] += 1
+        self._since_savepoint = {}
+        self._since_commit = {}
+
+    def rollback(self):
+        self._restore(self._since_savepoint)
+        self._restore(self._since_commit)
+        self._since_savepoint = {}
+        self._since_commit = {}
+        self._checked = []
+
+    def _restore(self, saved: Dict[Tuple[str, str], Optional[bytes]]):
+        for key, old in saved.items():
+            if old is None:
+                self.hashes.pop(key, None)
+            else:
+                self.hashes[key] = old
+
+    def log_stats(self, label: str):
+        logging.info("%s: change detection skipped %d unchanged movies, wrote tmdb=%d omdb=%d changed payloads",
+                     label, self.skipped, self.written["tmdb"], self.written["omdb"])
@@ -0,0 +1,154 @@
+"""
+pipeline.py
+
+Pipeline producer/consumer tách việc fetch mạng khỏi việc ghi DB:
+- Các worker fetch đẩy bản ghi đã parse vào một hàng đợi CÓ GIỚI HẠN (đầy thì worker phải chờ = backpressure)
+- Một stage writer riêng (thread) rút hàng đợi theo lô và ghi DB
+- Định kỳ log độ sâu hàng đợi, throughput từng stage và thời gian producer bị chặn
+Tổng thời gian tiến gần stage chậm hơn thay vì tổng của hai stage.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Iterable, List, Optional
+
+_STOP = object()
+
+
+class WritePipeline:
+    def __init__(self, write_batch: Callable[[List[Any]], None], maxsize: int = 200, batch_size: int = 25,
+                 name: str = "pipeline", report_every: float = 10.0):
+        self.write_batch = write_batch
+        self.batch_size = max(1, batch_size)
+        self.name = name
+        self.report_every = report_every
+        self.queue = queue.Queue(maxsize=max(1, maxsize))
+        self.produced = 0
+        self.written = 0
+        self.write_errors = 0
+        self.max_depth = 0
+        self.producer_blocked = 0.0   # giây producer phải chờ vì hàng đợi đầy
+        self.writer_busy = 0.0        # giây writer thực sự ghi
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run_writer, name=f"{name}-writer", daemon=True)
+        self._started = None
+        self._last_report = 0.0
+
+    def start(self):
+        self._started = self._last_report = time.perf_counter()
+        self._thread.start()
+        return self
+
+    # ---- producer side ----
+    def put(self, item):
+        """Đưa một bản ghi vào hàng đợi; chặn khi hàng đợi đầy (backpressure)."""
+        t0 = time.perf_counter()
+        self.queue.put(item)
+        self._produced(time.perf_counter() - t0)
+
+    def try_put(self, item) -> bool:
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            return False
+        self._produced(0.0)
+        return True
+
+    async def put_async(self, item, poll: float = 0.02):
+        """Bản asyncio của put: nhường event loop trong lúc hàng đợi đầy."""
+        t0 = time.perf_counter()
+        while not self.try_put(item):
+            await asyncio.sleep(poll)
+        with self._lock:
+            self.producer_blocked += time.perf_counter() - t0
+
+    def _produced(self, blocked: float):
+        with self._lock:
+            self.produced += 1
+            self.producer_blocked += blocked
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    # ---- writer side ----
+    def _run_writer(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            t0 = time.perf_counter()
+            try:
+                self.write_batch(batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.write_errors += len(batch)
+                logging.exception("%s: writer failed on batch of %d: %s", self.name, len(batch), e)
+            self.writer_busy += time.perf_counter() - t0
+            if time.perf_counter() - self._last_report >= self.report_every:
+                self.report()
+
+    def report(self):
+        self._last_report = time.perf_counter()
+        st = self.stats()
+        logging.info("%s: queue depth %d/%d (max %d), fetched %d (%.1f/s), written %d (%.1f/s), "
+                     "producer blocked %.1fs, writer busy %.1fs",
+                     self.name, st["depth"], self.queue.maxsize, st["max_depth"], st["produced"], st["fetch_rate"],
+                     st["written"], st["write_rate"], st["producer_blocked_s"], st["writer_busy_s"])
+
+    def stats(self) -> dict:
+        elapsed = max(time.perf_counter() - (self._started or time.perf_counter()), 1e-9)
+        return {
+            "depth": self.queue.qsize(), "max_depth": self.max_depth,
+            "produced": self.produced, "written": self.written, "write_errors": self.write_errors,
+            "fetch_rate": self.produced / elapsed, "write_rate": self.written / elapsed,
+            "producer_blocked_s": round(self.producer_blocked, 2), "writer_busy_s": round(self.writer_busy, 2),
+            "elapsed_s": round(elapsed, 2),
+        }
+
+    def close(self) -> dict:
+        """Báo writer dừng sau khi ghi hết hàng đợi, chờ nó xong và trả về thống kê."""
+        self.queue.put(_STOP)
+        self._thread.join()
+        self.report()
+        return self.stats()
+
+
+def run_pipeline(items: Iterable[Any], fetch: Callable[[Any], Optional[Any]],
+                 write_batch: Callable[[List[Any]], None], workers: int = 8, maxsize: int = 200,
+                 batch_size: int = 25, name: str = "pipeline") -> dict:
+    """
+    Fetch song song trên thread pool (`workers` luồng) -> hàng đợi có giới hạn -> writer theo lô.
+    fetch(item) trả về None thì bỏ qua item đó. Chỉ giữ tối đa 2*workers item đang xử lý.
+    """
+    pipe = WritePipeline(write_batch, maxsize=maxsize, batch_size=batch_size, name=name).start()
+
+    def task(item):
+        try:
+            record = fetch(item)
+        except Exception as e:
+            logging.exception("%s: fetch failed for %r: %s", name, item, e)
+            return
+        if record is not None:
+            pipe.put(record)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-fetch") as pool:
+        in_flight = set()
+        for item in items:
+            if len(in_flight) >= 2 * workers:
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            in_flight.add(pool.submit(task, item))
+        wait(in_flight)
+    return pipe.close()
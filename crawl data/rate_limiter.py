@@ -0,0 +1,150 @@
+"""
+rate_limiter.py
+
+- Token bucket theo từng host (TMDb, OMDb, IMDb, ...), kích thước theo quota công bố của nhà cung cấp
+- Đọc header Retry-After và X-RateLimit-Limit / X-RateLimit-Remaining / X-RateLimit-Reset
+- Tự điều chỉnh tốc độ: giảm một nửa khi bị 429, tăng dần trở lại trần quota khi server trả về bình thường
+- Thread-safe (dùng được cho chế độ crawl async chạy helper HTTP trên thread pool)
+"""
+
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After có thể là số giây hoặc một HTTP-date. Trả về số giây cần chờ (hoặc None)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _header_float(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket với tốc độ thích ứng (AIMD) cho một host."""
+
+    def __init__(self, name: str, rate: float, capacity: float, min_rate: float = None):
+        self.name = name
+        self.ceiling = float(rate)          # trần = quota công bố
+        self.rate = float(rate)             # tốc độ hiện tại (token/giây)
+        self.min_rate = float(min_rate) if min_rate else max(self.ceiling / 20, 0.05)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.blocked_until = 0.0            # monotonic time, do Retry-After / Remaining=0
+        self.requests = 0
+        self.throttle_events = 0
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Chờ tới khi có token. Trả về số giây đã chờ."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    self.requests += 1
+                    self.waited += waited
+                    return waited
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def observe(self, status_code: int, headers) -> Optional[float]:
+        """
+        Cập nhật trạng thái bucket từ response.
+        Trả về số giây bucket đã tạm dừng theo chỉ dẫn của server (Retry-After / X-RateLimit-Reset khi bị throttle);
+        None nếu server không cho chỉ dẫn nào: người gọi tự backoff.
+        """
+        headers = headers or {}
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        remaining = _header_float(headers, "X-RateLimit-Remaining")
+        reset = _header_float(headers, "X-RateLimit-Reset")
+        if reset is not None and reset > 1e9:   # một số API trả epoch seconds thay vì số giây còn lại
+            reset = max(0.0, reset - time.time())
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if status_code == 429 or (status_code == 503 and retry_after is not None):
+                # multiplicative decrease
+                self.throttle_events += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = 0.0
+                pause = retry_after if retry_after is not None else (reset if reset is not None else 1.0 / self.rate)
+                self.blocked_until = max(self.blocked_until, now + pause)
+                logging.warning("Rate limiter [%s]: throttled (status %s), pause %.1fs, rate -> %.2f req/s, events=%d",
+                                self.name, status_code, pause, self.rate, self.throttle_events)
+                return retry_after if retry_after is not None else reset
+
+            if remaining is not None:
+                # server biết rõ quota còn lại hơn bucket cục bộ
+                self.tokens = min(self.tokens, remaining)
+                if remaining <= 0 and reset is not None:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+                    logging.info("Rate limiter [%s]: quota exhausted, waiting %.1fs for reset", self.name, reset)
+            if 200 <= status_code < 400 and self.rate < self.ceiling:
+                # additive increase, quay lại trần quota sau khoảng 20 response tốt
+                self.rate = min(self.ceiling, self.rate + self.ceiling / 20)
+            return None
+
+    def state(self) -> dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "rate": round(self.rate, 2), "ceiling": self.ceiling, "tokens": round(self.tokens, 2),
+                "requests": self.requests, "throttle_events": self.throttle_events, "waited_s": round(self.waited, 1),
+            }
+
+
+class RateLimiter:
+    """Tập các TokenBucket theo tên host. Host chưa khai báo quota dùng bucket mặc định."""
+
+    def __init__(self, quotas: Dict[str, Tuple[float, float]], default: Tuple[float, float] = (5, 5)):
+        self.quotas = dict(quotas)
+        self.default = default
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self.buckets:
+                rate, capacity = self.quotas.get(host, self.default)
+                self.buckets[host] = TokenBucket(host, rate, capacity)
+            return self.buckets[host]
+
+    def acquire(self, host: str) -> float:
+        return self.bucket(host).acquire()
+
+    def observe(self, host: str, status_code: int, headers) -> Optional[float]:
+        return self.bucket(host).observe(status_code, headers)
+
+    def log_state(self):
+        for host, bucket in sorted(self.buckets.items()):
+            logging.info("Rate limiter [%s]: %s", host, bucket.state())
@@ -0,0 +1,127 @@
+"""
+raw_archive.py
+
+Kho lưu trữ response thô (append-only, nén) để dựng lại DB mà không cần gọi mạng:
+- Mỗi response một dòng NDJSON, nén thành một gzip member riêng, nối vào file theo nguồn + ngày:
+  <root>/<source>/<YYYY-MM-DD>.ndjson.gz (cả file vẫn là gzip hợp lệ, zcat đọc được)
+- Index SQLite <root>/index.sqlite: (source, key) -> file, offset, length -> đọc ngẫu nhiên một bản ghi
+- Cùng payload cho cùng (source, key) không ghi lại (so sánh sha256), nên cache hit không làm phình kho
+- Dùng gzip của thư viện chuẩn (không cần cài thêm zstd)
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Iterator, Optional, Tuple
+
+
+class RawArchive:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._files = {}
+        self.appended = 0
+        self.deduped = 0
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT,
+                key TEXT,
+                path TEXT,
+                offset INTEGER,
+                length INTEGER,
+                fetched_at REAL,
+                sha TEXT
+            );
+            CREATE INDEX IF NOT EXISTS ix_records_key ON records (source, key, id);
+        """)
+        self._db.commit()
+
+    def _file(self, rel_path: str):
+        f = self._files.get(rel_path)
+        if f is None:
+            full = os.path.join(self.root, rel_path)
+            os.makedirs(os.path.dirname(full), exist_ok=True)
+            f = self._files[rel_path] = open(full, "ab")
+        return f
+
+    def append(self, source: str, key, payload: Any, url: str = None) -> bool:
+        """Thêm một response (payload JSON hoặc chuỗi HTML). Trả về False nếu trùng bản mới nhất."""
+        key = str(key)
+        body = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        sha = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        now = time.time()
+        line = json.dumps({"source": source, "key": key, "url": url, "fetched_at": now}, ensure_ascii=False)
+        # payload đã serialize sẵn -> ghép chuỗi, không dumps hai lần
+        member = gzip.compress((line[:-1] + ', "payload": ' + body + "}\n").encode("utf-8"))
+        rel_path = os.path.join(source, f"{datetime.fromtimestamp(now):%Y-%m-%d}.ndjson.gz")
+        with self._lock:
+            row = self._db.execute("SELECT sha FROM records WHERE source = ? AND key = ? ORDER BY id DESC LIMIT 1",
+                                   (source, key)).fetchone()
+            if row and row[0] == sha:
+                self.deduped += 1
+                return False
+            f = self._file(rel_path)
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(member)
+            f.flush()
+            self._db.execute(
+                "INSERT INTO records (source, key, path, offset, length, fetched_at, sha) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, key, rel_path, offset, len(member), now, sha))
+            self._db.commit()
+            self.appended += 1
+        return True
+
+    def _read(self, rel_path: str, offset: int, length: int) -> dict:
+        with open(os.path.join(self.root, rel_path), "rb") as f:
+            f.seek(offset)
+            return json.loads(gzip.decompress(f.read(length)))
+
+    def latest(self, source: str, key) -> Optional[Any]:
+        """Payload mới nhất của (source, key), không có thì None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, offset, length FROM records WHERE source = ? AND key = ? ORDER BY id DESC LIMIT 1",
+                (source, str(key))).fetchone()
+        return self._read(*row)["payload"] if row else None
+
+    def iter_latest(self, source: str, since: datetime = None) -> Iterator[Tuple[str, Any]]:
+        """(key, payload) bản mới nhất của mỗi key, đọc tuần tự theo file/offset."""
+        sql = "SELECT MAX(id) FROM records WHERE source = ?"
+        params = [source]
+        if since:
+            sql += " AND fetched_at >= ?"
+            params.append(since.timestamp())
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, path, offset, length FROM records WHERE id IN ({sql} GROUP BY key) ORDER BY path, offset",
+                params).fetchall()
+        for key, path, offset, length in rows:
+            yield key, self._read(path, offset, length)["payload"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT source, COUNT(*), COUNT(DISTINCT key), SUM(length) FROM records GROUP BY source").fetchall()
+        return {source: {"records": n, "keys": keys, "bytes": size} for source, n, keys, size in rows}
+
+    def log_stats(self):
+        logging.info("Raw archive %s: appended %d, unchanged %d this run; totals %s",
+                     self.root, self.appended, self.deduped, self.stats())
+
+    def close(self):
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+            self._db.close()
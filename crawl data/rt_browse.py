@@ -0,0 +1,167 @@
+"""
+rt_browse.py
+
+Crawl các danh sách browse của Rotten Tomatoes (đang chiếu, tại gia, sắp chiếu, theo thể loại):
+- Mỗi danh sách được phân trang tới hết (?page=N, RT trả về danh sách tích lũy): dừng khi trang không có phim mới
+- Nhiều request đồng thời trên thread pool (các danh sách chạy song song, trang kế tiếp nộp ngay khi trang trước về)
+- Phim bỏ trùng theo slug URL RT và được yield ngay khi trang về (bước khớp phim chạy song song với crawl)
+- Lớp fetch thay được: CrawlbaseFetcher (mặc định) hoặc HttpFetcher (HTTP trực tiếp, vd server HTML cục bộ khi test)
+"""
+
+import logging
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+from bs4 import BeautifulSoup
+
+from crosswalk import rt_slug
+from title_index import normalize_title
+
+RT_SITE = "https://www.rottentomatoes.com"
+
+
+def tile_year(text):
+    """'Opened Mar 1, 2024' / 'Streaming Apr 16, 2024' -> 2024; không có năm -> None."""
+    m = re.search(r"\b(19|20)\d{2}\b", text or "")
+    return int(m.group()) if m else None
+
+
+def parse_rt_browse(html_content, base_url=RT_SITE):
+    """Tách danh sách phim (title, critics, audience, link, year) từ HTML trang browse"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    movies = soup.select('div[data-qa="discovery-media-list"] > div.flex-container')
+
+    movie_data = []
+    for movie in movies:
+        title_elem = movie.select_one('span[data-qa="discovery-media-list-item-title"]')
+        critics_elem = movie.select_one('rt-text[slot="criticsScore"]')
+        audience_elem = movie.select_one('rt-text[slot="audienceScore"]')
+        link_elem = movie.select_one('a[data-qa^="discovery-media-list-item"]')
+        date_elem = movie.select_one('[data-qa="discovery-media-list-item-start-date"]')
+
+        if title_elem:
+            movie_data.append({
+                'title': title_elem.text.strip(),
+                'critics_score': critics_elem.text.strip() if critics_elem else None,
+                'audience_score': audience_elem.text.strip() if audience_elem else None,
+                'link': base_url.rstrip('/') + link_elem['href'] if link_elem else None,
+                'year': tile_year(date_elem.text) if date_elem else None
+            })
+    return movie_data
+
+
+def item_key(item: dict) -> str:
+    """Khóa bỏ trùng: slug RT, không có link thì tên chuẩn hóa."""
+    return rt_slug(item.get('link')) or f"title:{normalize_title(item.get('title'))}"
+
+
+class CrawlbaseFetcher:
+    """Lấy HTML qua Crawlbase (render JS). Mỗi luồng một CrawlingAPI."""
+
+    def __init__(self, token: str, options: Dict[str, str] = None):
+        from crawlbase import CrawlingAPI     # chỉ cần khi dùng Crawlbase
+        self._api_class = CrawlingAPI
+        self.token = token
+        self.options = options or {}
+        self._local = threading.local()
+
+    def __call__(self, url: str) -> Optional[str]:
+        api = getattr(self._local, "api", None)
+        if api is None:
+            api = self._local.api = self._api_class({'token': self.token})
+        response = api.get(url, self.options)
+        if response.get('status_code') != 200:
+            logging.warning("Crawlbase: status %s for %s", response.get('status_code'), url)
+            return None
+        return response['body'].decode('utf-8')
+
+
+class HttpFetcher:
+    """Lấy HTML bằng HTTP GET trực tiếp (server fixture cục bộ hoặc trang đã render sẵn)."""
+
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self, url: str) -> Optional[str]:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        resp = session.get(url, timeout=self.timeout)
+        if resp.status_code != 200:
+            logging.warning("RT fetch: HTTP %s for %s", resp.status_code, url)
+            return None
+        return resp.text
+
+
+class RTBrowseCrawler:
+    def __init__(self, fetch: Callable[[str], Optional[str]], lists: Iterable[str], max_pages: int = 20,
+                 workers: int = 4, base_url: str = RT_SITE, archive=None):
+        self.fetch = fetch
+        self.lists = [l.strip().strip("/") for l in lists if l.strip()]
+        self.max_pages = max(1, max_pages)
+        self.workers = max(1, workers)
+        self.base_url = base_url.rstrip("/")
+        self.archive = archive
+        self.stats = {"pages": 0, "failed": 0, "items": 0, "duplicates": 0}
+
+    def page_url(self, browse_list: str, page: int) -> str:
+        url = f"{self.base_url}/browse/{browse_list}"
+        return url if page == 1 else f"{url}?page={page}"
+
+    def _fetch_page(self, browse_list: str, page: int) -> List[dict]:
+        url = self.page_url(browse_list, page)
+        html = self.fetch(url)
+        if html is None:
+            raise RuntimeError(f"no HTML for {url}")
+        if self.archive is not None:
+            self.archive.append('rt_html', url, html, url=url)
+        return parse_rt_browse(html, self.base_url)
+
+    def stream(self) -> Iterator[dict]:
+        """Yield từng phim (thêm 'slug', 'list') ngay khi trang của nó về, đã bỏ trùng theo slug."""
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rt-browse")
+        futures = {}
+        seen = set()
+        list_seen: Dict[str, set] = {l: set() for l in self.lists}
+
+        def submit(browse_list: str, page: int):
+            futures[pool.submit(self._fetch_page, browse_list, page)] = (browse_list, page)
+
+        try:
+            for browse_list in self.lists:
+                submit(browse_list, 1)
+            while futures:
+                done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    browse_list, page = futures.pop(fut)
+                    try:
+                        items = fut.result()
+                    except Exception as e:
+                        self.stats["failed"] += 1
+                        logging.warning("RT browse %s page %d failed: %s", browse_list, page, e)
+                        continue
+                    self.stats["pages"] += 1
+                    new_in_list = 0
+                    for item in items:
+                        key = item_key(item)
+                        if key not in list_seen[browse_list]:
+                            list_seen[browse_list].add(key)
+                            new_in_list += 1
+                        if key in seen:
+                            self.stats["duplicates"] += 1
+                            continue
+                        seen.add(key)
+                        self.stats["items"] += 1
+                        yield dict(item, slug=rt_slug(item.get('link')), list=browse_list)
+                    logging.info("RT browse %s page %d: %d items, %d new in list (%d pending)",
+                                 browse_list, page, len(items), new_in_list, len(futures))
+                    # trang tích lũy: còn phim mới thì còn trang sau
+                    if new_in_list and page < self.max_pages:
+                        submit(browse_list, page + 1)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            logging.info("RT browse: %s", self.stats)
@@ -0,0 +1,278 @@
+"""
+rt_details.py
+
+Làm giàu dữ liệu RT từ trang chi tiết phim (link lấy từ trang browse), ghi vào bảng RT_Details (sql/SQLQuery1.sql):
+- Số review của giới phê bình, số lượt đánh giá khán giả, cờ Certified Fresh, ngày phát hành (rạp / streaming)
+- Nhiều request đồng thời trên thread pool, tổng tốc độ giới hạn bằng một TokenBucket (rate_limiter.py)
+- Trang đã kiểm tra trong vòng TTL (RT_Details.checked_at) không tải lại: không tốn request Crawlbase
+- Dấu vân tay nội dung (sha256 trên scorecard JSON, JSON-LD và mục ngày phát hành): trang quá TTL được tải lại,
+  nhưng nếu không đổi so với lượt trước thì không parse, không ghi lại, chỉ cập nhật checked_at
+"""
+
+import hashlib
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from rate_limiter import TokenBucket
+
+RT_DETAILS_DDL = """
+IF OBJECT_ID(N'RT_Details', N'U') IS NULL
+CREATE TABLE RT_Details (
+    rt_slug NVARCHAR(255) PRIMARY KEY,
+    movie_id NVARCHAR(50) NULL,
+    critics_review_count INT NULL,
+    audience_rating_count INT NULL,
+    certified_fresh BIT NULL,
+    release_date_theaters DATE NULL,
+    release_date_streaming DATE NULL,
+    release_year INT NULL,
+    content_hash BINARY(32) NOT NULL,
+    updated_at DATETIME DEFAULT GETDATE(),
+    checked_at DATETIME DEFAULT GETDATE()
+);
+"""
+
+DETAIL_COLUMNS = ("critics_review_count", "audience_rating_count", "certified_fresh",
+                  "release_date_theaters", "release_date_streaming", "release_year")
+
+_SCORECARD_RE = re.compile(r'<script[^>]*id="media-scorecard-json"[^>]*>(.*?)</script>', re.S)
+_LD_JSON_RE = re.compile(r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>', re.S)
+_RELEASE_RE = re.compile(r'Release Date \((?:Theaters|Streaming)\).{0,600}', re.S)
+_TAG_RE = re.compile(r'<[^>]+>')
+_DATE_FORMATS = ("%b %d, %Y", "%B %d, %Y", "%Y-%m-%d")
+
+
+def ensure_table(cursor):
+    """Tạo RT_Details nếu chưa có (database không dựng từ sql/SQLQuery1.sql)."""
+    cursor.execute(RT_DETAILS_DDL)
+
+
+def page_fingerprint(html: str) -> bytes:
+    """sha256 trên các phần mang dữ liệu của trang (bỏ qua nonce, quảng cáo, token thay đổi mỗi lần tải)."""
+    parts = _SCORECARD_RE.findall(html) + _LD_JSON_RE.findall(html)
+    parts += [" ".join(_TAG_RE.sub(" ", m).split()) for m in _RELEASE_RE.findall(html)]
+    payload = "\x1f".join(parts) if parts else html
+    return hashlib.sha256(payload.encode("utf-8")).digest()
+
+
+def _count(value) -> Optional[int]:
+    """401 / '401 Reviews' / '10,000+ Ratings' -> số nguyên; không có số -> None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    m = re.search(r"\d[\d,]*", str(value or ""))
+    return int(m.group().replace(",", "")) if m else None
+
+
+def _date(value) -> Optional[str]:
+    """'Mar 1, 2024' / '2024-03-01T08:00:00' -> '2024-03-01'."""
+    text = " ".join(str(value or "").replace("\xa0", " ").split())
+    text = re.split(r",?\s*\b(?:wide|limited|original)\b", text, 1, flags=re.I)[0].strip(" ,")
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text[:10] if fmt == "%Y-%m-%d" else text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _json_blocks(soup, selector) -> List[dict]:
+    blocks = []
+    for script in soup.select(selector):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        blocks.extend(data if isinstance(data, list) else [data])
+    return [b for b in blocks if isinstance(b, dict)]
+
+
+def _release_date(soup, label: str) -> Optional[str]:
+    """Giá trị của mục 'Release Date (Theaters)' / '(Streaming)' trong Movie Info (markup mới và cũ)."""
+    for elem in soup.find_all(string=re.compile(re.escape(label))):
+        holder = elem.find_parent(["dt", "b", "li", "div"])
+        if holder is None:
+            continue
+        value = holder.find_next_sibling(["dd", "span"]) if holder.name in ("dt", "b") else holder
+        if value is None:
+            continue
+        time_elem = value.find("time")
+        found = _date(time_elem.get("datetime") if time_elem and time_elem.get("datetime") else
+                      value.get_text(" ", strip=True).replace(label, "").lstrip(": "))
+        if found:
+            return found
+    return None
+
+
+def parse_rt_detail(html: str) -> Dict[str, object]:
+    """Tách số review, Certified Fresh, ngày phát hành từ HTML trang chi tiết phim RT."""
+    soup = BeautifulSoup(html, 'html.parser')
+    detail = dict.fromkeys(DETAIL_COLUMNS)
+
+    scorecard = next(iter(_json_blocks(soup, 'script#media-scorecard-json')), {})
+    critics = scorecard.get("criticsScore") or {}
+    audience = scorecard.get("audienceScore") or {}
+    detail["critics_review_count"] = _count(critics.get("reviewCount") or critics.get("ratingCount"))
+    detail["audience_rating_count"] = _count(audience.get("reviewCount") or audience.get("bandedRatingCount"))
+    if critics:
+        detail["certified_fresh"] = bool(critics.get("certified")) and \
+            str(critics.get("sentiment", "POSITIVE")).upper() == "POSITIVE"
+
+    movie = next((b for b in _json_blocks(soup, 'script[type="application/ld+json"]')
+                  if b.get("@type") == "Movie"), {})
+    if detail["critics_review_count"] is None:
+        rating = movie.get("aggregateRating") or {}
+        detail["critics_review_count"] = _count(rating.get("reviewCount") or rating.get("ratingCount"))
+    if detail["critics_review_count"] is None:
+        link = soup.select_one('[slot="criticsReviews"]')
+        detail["critics_review_count"] = _count(link.get_text()) if link else None
+    if detail["audience_rating_count"] is None:
+        link = soup.select_one('[slot="audienceReviews"]')
+        detail["audience_rating_count"] = _count(link.get_text()) if link else None
+    if detail["certified_fresh"] is None:
+        board = soup.select_one('score-icon-critics, score-board, score-board-deprecated')
+        if board is not None:
+            state = " ".join(str(board.get(a, "")) for a in ("certified", "state", "tomatometerstate")).lower()
+            detail["certified_fresh"] = "certified-fresh" in state or \
+                (board.get("certified") == "true" and board.get("sentiment", "positive") == "positive")
+
+    detail["release_date_theaters"] = _release_date(soup, "Release Date (Theaters)")
+    detail["release_date_streaming"] = _release_date(soup, "Release Date (Streaming)")
+    first = detail["release_date_theaters"] or detail["release_date_streaming"] or _date(movie.get("dateCreated"))
+    detail["release_year"] = int(first[:4]) if first else None
+    return detail
+
+
+class RTDetailStore:
+    """content_hash / movie_id / độ mới của các trang đã lưu (nạp một lần), ghi kết quả theo tập qua bảng tạm."""
+
+    def __init__(self):
+        self.hashes: Dict[str, bytes] = {}
+        self.movie_ids: Dict[str, Optional[str]] = {}
+        self.fresh: set = set()
+
+    def load(self, cursor, ttl_hours: float = 0):
+        """ttl_hours > 0: trang có checked_at trong vòng ttl_hours (theo đồng hồ SQL Server) được coi là còn mới."""
+        cursor.execute("""
+            SELECT rt_slug, content_hash, movie_id,
+                   CASE WHEN checked_at >= DATEADD(MINUTE, -?, GETDATE()) THEN 1 ELSE 0 END
+            FROM RT_Details
+        """, int(ttl_hours * 60))
+        for slug, digest, movie_id, fresh in cursor.fetchall():
+            self.hashes[slug] = bytes(digest)
+            self.movie_ids[slug] = movie_id
+            if fresh and ttl_hours > 0:
+                self.fresh.add(slug)
+        return self
+
+    def is_fresh(self, slug: str) -> bool:
+        return slug in self.fresh
+
+    def unchanged(self, slug: str, digest: bytes) -> bool:
+        return self.hashes.get(slug) == digest
+
+    def save(self, cursor, changed: List[Tuple], checked: List[Tuple[Optional[str], str]],
+             relinked: List[Tuple[str, str]] = ()) -> None:
+        """
+        changed: (slug, movie_id, *DETAIL_COLUMNS, content_hash) -> MERGE từ #rt_details;
+        checked: (movie_id, slug) của trang không đổi -> chỉ cập nhật checked_at (và movie_id nếu mới khớp);
+        relinked: (movie_id, slug) của trang còn mới (không tải) nhưng vừa khớp được phim -> chỉ cập nhật movie_id.
+        Không commit.
+        """
+        if changed:
+            cols = ("rt_slug", "movie_id") + DETAIL_COLUMNS + ("content_hash",)
+            cursor.execute("""
+                CREATE TABLE #rt_details (
+                    rt_slug NVARCHAR(255) PRIMARY KEY, movie_id NVARCHAR(50),
+                    critics_review_count INT, audience_rating_count INT, certified_fresh BIT,
+                    release_date_theaters DATE, release_date_streaming DATE, release_year INT,
+                    content_hash BINARY(32)
+                )
+            """)
+            cursor.fast_executemany = True
+            cursor.executemany(f"INSERT INTO #rt_details ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)})",
+                               changed)
+            cursor.fast_executemany = False
+            updates = ", ".join(f"{c} = s.{c}" for c in cols[2:])
+            cursor.execute(f"""
+                MERGE RT_Details WITH (HOLDLOCK) AS t
+                USING #rt_details AS s ON t.rt_slug = s.rt_slug
+                WHEN MATCHED THEN UPDATE SET movie_id = COALESCE(s.movie_id, t.movie_id), {updates},
+                    updated_at = GETDATE(), checked_at = GETDATE()
+                WHEN NOT MATCHED THEN INSERT ({', '.join(cols)}) VALUES ({', '.join('s.' + c for c in cols)});
+            """)
+            cursor.execute("DROP TABLE #rt_details")
+            self.hashes.update((row[0], row[-1]) for row in changed)
+        if checked:
+            cursor.fast_executemany = True
+            cursor.executemany("UPDATE RT_Details SET movie_id = COALESCE(?, movie_id), checked_at = GETDATE() "
+                               "WHERE rt_slug = ?", checked)
+            cursor.fast_executemany = False
+        if relinked:
+            cursor.executemany("UPDATE RT_Details SET movie_id = ? WHERE rt_slug = ?", list(relinked))
+
+
+class RTDetailEnricher:
+    def __init__(self, fetch: Callable[[str], Optional[str]], store: RTDetailStore, rate: float = 2.0,
+                 workers: int = 4, archive=None):
+        self.fetch = fetch
+        self.store = store
+        self.workers = max(1, workers)
+        self.bucket = TokenBucket("rt-detail", rate, max(1.0, rate))
+        self.archive = archive
+        self.stats = {"fresh": 0, "fetched": 0, "changed": 0, "unchanged": 0, "failed": 0}
+
+    def _fetch_one(self, job: Tuple[str, str, Optional[str]]):
+        slug, link, movie_id = job
+        self.bucket.acquire()
+        try:
+            html = self.fetch(link)
+        except Exception as e:
+            logging.warning("RT detail %s failed: %s", link, e)
+            return slug, movie_id, None, None
+        if html is None:
+            return slug, movie_id, None, None
+        if self.archive is not None:
+            self.archive.append('rt_detail_html', link, html, url=link)
+        digest = page_fingerprint(html)
+        if self.store.unchanged(slug, digest):
+            return slug, movie_id, digest, None
+        return slug, movie_id, digest, parse_rt_detail(html)
+
+    def run(self, jobs: Iterable[Tuple[str, str, Optional[str]]]):
+        """
+        jobs: (slug, link, movie_id). Trang còn mới (store.is_fresh) bị bỏ qua trước khi tải.
+        Trả về (changed, checked, relinked) đúng định dạng RTDetailStore.save và {slug: detail} của các trang đã parse.
+        """
+        changed, checked, relinked, details = [], [], [], {}
+        due = []
+        for job in jobs:
+            slug, _, movie_id = job
+            if not self.store.is_fresh(slug):
+                due.append(job)
+                continue
+            self.stats["fresh"] += 1
+            if movie_id and movie_id != self.store.movie_ids.get(slug):
+                relinked.append((movie_id, slug))
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rt-detail") as pool:
+            for slug, movie_id, digest, detail in pool.map(self._fetch_one, due):
+                if digest is None:
+                    self.stats["failed"] += 1
+                    continue
+                self.stats["fetched"] += 1
+                if detail is None:
+                    self.stats["unchanged"] += 1
+                    checked.append((movie_id, slug))
+                    continue
+                self.stats["changed"] += 1
+                details[slug] = detail
+                changed.append((slug, movie_id) + tuple(detail[c] for c in DETAIL_COLUMNS) + (digest,))
+        logging.info("RT details: %s, limiter %s", self.stats, self.bucket.state())
+        return changed, checked, relinked, details
@@ -0,0 +1,162 @@
+"""
+scheduler.py
+
+Lập lịch crawl theo giá trị + ngân sách cho mỗi lượt chạy:
+- Mỗi phim ứng viên có điểm = độ phổ biến TMDb (log) + độ cũ của dữ liệu đã lưu + số trường còn thiếu
+- Hàng đợi ưu tiên (heapq): phim giá trị cao nhất được crawl trước
+- CrawlBudget: dừng gọn khi hết thời gian (wall-clock) hoặc hết số request API cho phép theo host;
+  phim đang xử lý vẫn được ghi xong, phần còn lại để lượt sau
+"""
+
+import heapq
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# Trạng thái đã lưu của từng phim: lần kiểm tra gần nhất (Movie_Payload_Hash.checked_at, không có thì
+# Ratings.last_updated) + số trường còn thiếu
+STATE_SQL = """
+SELECT m.tmdb_id,
+       COALESCE((SELECT MAX(h.checked_at) FROM Movie_Payload_Hash h WHERE h.movie_id = m.movie_id),
+                r.last_updated, m.created_at) AS last_updated,
+       CASE WHEN m.release_date IS NULL THEN 1 ELSE 0 END
+     + CASE WHEN m.director_id IS NULL THEN 1 ELSE 0 END
+     + CASE WHEN r.score IS NULL THEN 1 ELSE 0 END
+     + CASE WHEN f.budget IS NULL THEN 1 ELSE 0 END
+     + CASE WHEN f.revenue_domestic IS NULL THEN 1 ELSE 0 END
+     + CASE WHEN NOT EXISTS (SELECT 1 FROM Movie_Genres g WHERE g.movie_id = m.movie_id) THEN 1 ELSE 0 END AS missing
+FROM Movies m
+LEFT JOIN Ratings r ON r.movie_id = m.movie_id AND r.source_name = 'IMDb'
+LEFT JOIN Financials f ON f.movie_id = m.movie_id
+WHERE m.tmdb_id IS NOT NULL
+"""
+MAX_MISSING = 6     # số trường STATE_SQL kiểm tra (phim chưa có trong DB coi như thiếu hết)
+
+
+def load_stored_state(conn) -> Dict[int, Tuple[Optional[datetime], int]]:
+    """{tmdb_id: (last_updated, missing)} cho các phim đã có trong DB."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(STATE_SQL)
+        return {tmdb_id: (last_updated, missing) for tmdb_id, last_updated, missing in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+class CrawlBudget:
+    """
+    Ngân sách của một lượt chạy: max_seconds (0 = không giới hạn) và max_requests {host: số request mạng}.
+    Số request đọc từ bộ đếm của RateLimiter (chỉ tính request thật, cache hit không tốn quota).
+    reserve: số request dành cho các phim đã phát nhưng chưa fetch xong (buffer + worker đang chạy),
+    nên tổng thực tế không vượt max_requests.
+    """
+
+    def __init__(self, max_seconds: float = 0, max_requests: Dict[str, int] = None, limiter=None, reserve: int = 0):
+        self.max_seconds = max_seconds
+        self.max_requests = {h: n for h, n in (max_requests or {}).items() if n}
+        self.limiter = limiter
+        self.reserve = reserve
+        self.started = time.monotonic()
+        self._base = {h: self._count(h) for h in self.max_requests}
+        self.reason = None
+
+    def _count(self, host: str) -> int:
+        return self.limiter.bucket(host).requests if self.limiter else 0
+
+    def used(self) -> Dict[str, int]:
+        return {h: self._count(h) - self._base[h] for h in self.max_requests}
+
+    def exhausted(self) -> bool:
+        if self.reason:
+            return True
+        elapsed = time.monotonic() - self.started
+        if self.max_seconds and elapsed >= self.max_seconds:
+            self.reason = f"time budget {self.max_seconds:.0f}s used"
+        for host, used in self.used().items():
+            if used + self.reserve >= self.max_requests[host]:
+                self.reason = f"{host} request budget {self.max_requests[host]} used"
+        return self.reason is not None
+
+    def limit(self, items: Iterable[dict]) -> Iterator[dict]:
+        """Phát item cho tới khi hết ngân sách (item đã phát vẫn được xử lý xong)."""
+        n = 0
+        for item in items:
+            if self.exhausted():
+                logging.warning("Crawl budget: stopping after %d movies (%s), %.0fs elapsed, requests %s",
+                                n, self.reason, time.monotonic() - self.started, self.used())
+                return
+            n += 1
+            yield item
+
+    def summary(self) -> dict:
+        return {"elapsed_s": round(time.monotonic() - self.started, 1), "requests": self.used(),
+                "stopped": self.reason}
+
+
+def parse_budget(spec: str) -> Dict[str, int]:
+    """ "tmdb=20000,omdb=900" -> {"tmdb": 20000, "omdb": 900}."""
+    result = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            host, n = part.split("=", 1)
+            result[host.strip()] = int(n)
+    return result
+
+
+class CrawlScheduler:
+    """
+    Xếp hạng ứng viên (item discover {"id", "popularity", ...} và phim đã lưu) theo điểm giá trị,
+    phát ra theo thứ tự điểm giảm dần bằng heapq. Phim đã có trong DB được đánh dấu refresh.
+    """
+
+    def __init__(self, weights: Dict[str, float], stale_days: float = 30.0, now: datetime = None):
+        self.weights = weights
+        self.stale_days = stale_days
+        self.now = now or datetime.now()
+        self._heap = []
+        self._seq = 0
+
+    def score(self, popularity: float, last_updated: Optional[datetime], missing: int) -> float:
+        if last_updated is None:
+            staleness = 1.0
+        else:
+            age_days = (self.now - last_updated).total_seconds() / 86400
+            staleness = min(max(age_days, 0.0) / self.stale_days, 1.0)
+        w = self.weights
+        return (w.get("popularity", 1.0) * math.log1p(max(popularity or 0.0, 0.0))
+                + w.get("staleness", 1.0) * staleness
+                + w.get("missing", 1.0) * missing / MAX_MISSING)
+
+    def add(self, item: dict, state: Tuple[Optional[datetime], int] = None):
+        last_updated, missing = state if state else (None, MAX_MISSING)
+        score = self.score(item.get("popularity"), last_updated, missing)
+        entry = {"id": item["id"], "refresh": bool(item.get("refresh") or state), "priority": round(score, 4)}
+        heapq.heappush(self._heap, (-score, self._seq, entry))
+        self._seq += 1
+
+    def plan(self, candidates: Iterable[dict], stored: Dict[int, Tuple[Optional[datetime], int]],
+             include_stored: bool = True) -> "CrawlScheduler":
+        """Ứng viên từ discover + (tùy chọn) mọi phim đã lưu chưa nằm trong discover (popularity = 0)."""
+        seen = set()
+        for item in candidates:
+            if item.get("id") is None or item["id"] in seen:
+                continue
+            seen.add(item["id"])
+            self.add(item, stored.get(item["id"]))
+        if include_stored:
+            for tmdb_id, state in stored.items():
+                if tmdb_id not in seen:
+                    self.add({"id": tmdb_id}, state)
+        logging.info("Scheduler: %d candidates (%d from discover, %d stored)",
+                     len(self._heap), len(seen), len(self._heap) - len(seen))
+        return self
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self) -> Iterator[dict]:
+        while self._heap:
+            _, _, entry = heapq.heappop(self._heap)
+            yield entry
@@ -0,0 +1,73 @@
+"""
+sql_impute.py
+
+Điền giá trị NULL ngay trong SQL Server (set-based), dữ liệu không đi qua Python:
+- Mỗi cột một câu UPDATE ... FROM với giá trị thay thế tính bằng SQL: mean (AVG), median (PERCENTILE_CONT)
+  hoặc mode (giá trị xuất hiện nhiều nhất)
+- Tùy chọn theo nhóm (vd per-genre): dùng giá trị của nhóm, nhóm không có dữ liệu thì lùi về giá trị toàn bảng
+- Thời gian chạy không phụ thuộc số dòng phải kéo về client (chỉ số dòng bị ảnh hưởng được trả về)
+"""
+
+from typing import Dict, Iterable, Optional
+
+STRATEGIES = ("mean", "median", "mode")
+
+
+def _fill_values(table: str, column: str, strategy: str, group_by: Optional[str], where: str) -> str:
+    """Subquery (grp, val): giá trị thay thế cho cột, theo nhóm group_by hoặc một dòng cho cả bảng."""
+    grp = f"[{group_by}]" if group_by else "CAST(NULL AS INT)"
+    partition = f"PARTITION BY [{group_by}]" if group_by else ""
+    base = f"FROM [{table}] WHERE [{column}] IS NOT NULL AND ({where})"
+    if strategy == "mean":
+        group_clause = f"GROUP BY [{group_by}]" if group_by else ""
+        return f"SELECT {grp} AS grp, AVG(CAST([{column}] AS FLOAT)) AS val {base} {group_clause}"
+    if strategy == "median":
+        return (f"SELECT DISTINCT {grp} AS grp, "
+                f"PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY [{column}]) OVER ({partition}) AS val {base}")
+    if strategy == "mode":
+        group_cols = f"[{group_by}], [{column}]" if group_by else f"[{column}]"
+        return (f"SELECT grp, val FROM ("
+                f"SELECT {grp} AS grp, [{column}] AS val, "
+                f"ROW_NUMBER() OVER ({partition} ORDER BY COUNT(*) DESC, [{column}]) AS rn "
+                f"{base} GROUP BY {group_cols}) x WHERE rn = 1")
+    raise ValueError(f"unknown imputation strategy {strategy!r} (expected one of {STRATEGIES})")
+
+
+def impute_nulls(cursor, table: str, columns: Iterable[str], strategy: str = "mean",
+                 group_by: Optional[str] = None, where: str = "1 = 1") -> Dict[str, int]:
+    """
+    Điền NULL của từng cột trong `table` bằng giá trị `strategy` tính trên các dòng thỏa `where`.
+    group_by: cột nhóm (vd "Genre"); NULL được điền theo nhóm, lùi về giá trị toàn bảng.
+    Không commit. Trả về {cột: số dòng đã điền}.
+    """
+    updated = {}
+    for column in columns:
+        overall = _fill_values(table, column, strategy, None, where)
+        if group_by:
+            grouped = _fill_values(table, column, strategy, group_by, where)
+            sql = f"""
+                UPDATE t SET [{column}] = COALESCE(g.val, a.val)
+                FROM [{table}] t
+                LEFT JOIN ({grouped}) g ON g.grp = t.[{group_by}]
+                LEFT JOIN ({overall}) a ON 1 = 1
+                WHERE t.[{column}] IS NULL AND ({where}) AND COALESCE(g.val, a.val) IS NOT NULL
+            """
+        else:
+            sql = f"""
+                UPDATE t SET [{column}] = a.val
+                FROM [{table}] t
+                JOIN ({overall}) a ON a.val IS NOT NULL
+                WHERE t.[{column}] IS NULL AND ({where})
+            """
+        cursor.execute(sql)
+        updated[column] = cursor.rowcount
+    return updated
+
+
+def null_counts(cursor, table: str, columns: Iterable[str], where: str = "1 = 1") -> Dict[str, int]:
+    """{cột: số dòng NULL} bằng một câu SELECT."""
+    columns = list(columns)
+    cursor.execute("SELECT " + ", ".join(f"SUM(CASE WHEN [{c}] IS NULL THEN 1 ELSE 0 END)" for c in columns)
+                   + f" FROM [{table}] WHERE {where}")
+    row = cursor.fetchone()
+    return {c: int(n or 0) for c, n in zip(columns, row)}
@@ -0,0 +1,144 @@
+"""
+title_index.py
+
+Chỉ mục tên phim dựng một lần mỗi lượt chạy, dùng để khớp tên phim từ nguồn ngoài (Rotten Tomatoes) với Movies:
+- Tên được chuẩn hóa đúng một lần khi dựng chỉ mục
+- Exact: hash map tên chuẩn hóa -> phim
+- Fuzzy: chỉ mục đảo trigram ký tự -> phim, điểm tương đồng Dice trên tập trigram;
+  chỉ duyệt danh sách của các trigram hiếm nhất (prefix filtering) nên tra cứu không quét cả catalogue
+- Năm phát hành dùng để phân xử khi nhiều phim cùng điểm / cùng tên
+- Mỗi kết quả kèm độ tin cậy (confidence) 0..1
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+FUZZY_THRESHOLD = 0.6   # Dice tối thiểu để coi là khớp
+COMMON_GRAM_MIN = 1000  # trigram có danh sách dài hơn max(giá trị này, 2% catalogue) chỉ dùng làm cận trên
+
+
+def normalize_title(title: str) -> str:
+    """Chuẩn hóa tên phim để so sánh (chữ thường, bỏ dấu câu, gộp khoảng trắng)."""
+    normalized = re.sub(r'[^\w\s]', '', (title or "").lower())
+    return re.sub(r'\s+', ' ', normalized).strip()
+
+
+def trigrams(normalized: str) -> frozenset:
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TitleMatch(NamedTuple):
+    movie_id: str
+    title: str
+    year: Optional[int]
+    match_type: str         # "exact" | "fuzzy"
+    confidence: float
+
+
+class TitleIndex:
+    def __init__(self, movies: Iterable[Tuple] = (), threshold: float = FUZZY_THRESHOLD):
+        """movies: (movie_id, title) hoặc (movie_id, title, year)."""
+        self.threshold = threshold
+        self._movies: List[Tuple[str, str, Optional[int]]] = []
+        self._grams: List[frozenset] = []
+        self._sizes: List[int] = []
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for row in movies:
+            self.add(row[0], row[1], row[2] if len(row) > 2 else None)
+
+    def add(self, movie_id: str, title: str, year: Optional[int] = None):
+        norm = normalize_title(title)
+        if not norm:
+            return
+        i = len(self._movies)
+        grams = trigrams(norm)
+        self._movies.append((movie_id, title, year))
+        self._grams.append(grams)
+        self._sizes.append(len(grams))
+        self._exact[norm].append(i)
+        for g in grams:
+            self._postings[g].append(i)
+
+    def __len__(self):
+        return len(self._movies)
+
+    @staticmethod
+    def _year_key(movie_year: Optional[int], year: Optional[int]) -> Tuple[int, int]:
+        """Khóa phân xử: cùng năm trước, rồi năm gần hơn, rồi phim mới hơn."""
+        if year is None or movie_year is None:
+            return (0, movie_year or 0)
+        return (-abs(movie_year - year), movie_year)
+
+    def _result(self, i: int, match_type: str, confidence: float) -> TitleMatch:
+        movie_id, title, year = self._movies[i]
+        return TitleMatch(movie_id, title, year, match_type, round(confidence, 3))
+
+    def lookup(self, title: str, year: Optional[int] = None) -> Optional[TitleMatch]:
+        """Phim khớp nhất với `title` (năm `year` nếu biết) hoặc None nếu dưới ngưỡng."""
+        norm = normalize_title(title)
+        if not norm:
+            return None
+
+        exact = self._exact.get(norm)
+        if exact:
+            best = max(exact, key=lambda i: self._year_key(self._movies[i][2], year))
+            # nhiều phim trùng tên mà năm không phân xử được -> bớt tin cậy
+            ambiguous = len(exact) > 1 and (year is None or self._movies[best][2] != year)
+            return self._result(best, "exact", 0.9 if ambiguous else 1.0)
+
+        grams = trigrams(norm)
+        q = len(grams)
+        t = self.threshold
+        # Dice >= t  =>  |c| trong [t/(2-t)*|q|, (2-t)/t*|q|]  và  số trigram chung >= ceil(t*|q|/(2-t)) = m.
+        # Prefix filtering: ứng viên phải chứa ít nhất một trong (|q| - m + 1) trigram hiếm nhất của query.
+        # Đếm trigram chung trên danh sách đảo của prefix (mở rộng thêm các trigram không quá phổ biến);
+        # các trigram còn lại chỉ cho cận trên, nên phần lớn ứng viên bị loại mà không cần giao tập.
+        lo, hi = t / (2 - t) * q, (2 - t) / t * q
+        m = max(1, math.ceil(t * q / (2 - t) - 1e-9))
+        postings = self._postings
+        ordered = sorted(grams, key=lambda g: len(postings.get(g, ())))
+        cap = max(COMMON_GRAM_MIN, len(self._movies) // 50)
+        prefix = q - m + 1
+        while prefix < q and len(postings.get(ordered[prefix], ())) <= cap:
+            prefix += 1
+        rest = q - prefix
+
+        counts = Counter()
+        for g in ordered[:prefix]:
+            counts.update(postings.get(g, ()))
+
+        # ứng viên ngắn nhất cho phép vẫn cần ceil(t*(|q|+lo)/2) trigram chung
+        min_shared = math.ceil(t * (q + lo) / 2 - 1e-9) - rest
+        scored = []
+        sizes = self._sizes
+        for i, shared in counts.items():
+            if shared < min_shared:
+                continue
+            size = sizes[i]
+            if size < lo or size > hi:
+                continue
+            upper = 2 * (shared + rest) / (q + size)
+            if upper >= t:
+                scored.append((upper, i))
+        scored.sort(reverse=True)
+
+        best, best_key = None, None
+        for upper, i in scored:
+            if best_key is not None and round(upper, 3) < best_key[0]:
+                break       # cận trên đã thấp hơn điểm tốt nhất: không ứng viên nào còn lại thắng được
+            score = upper if not rest else 2 * len(grams & self._grams[i]) / (q + sizes[i])
+            if score < t:
+                continue
+            key = (round(score, 3), self._year_key(self._movies[i][2], year))
+            if best_key is None or key > best_key:
+                best, best_key = i, key
+        if best is None:
+            return None
+        confidence = best_key[0]
+        if year is not None and self._movies[best][2] is not None and self._movies[best][2] != year:
+            confidence *= 0.9       # khác năm: giảm nhẹ độ tin cậy
+        return self._result(best, "fuzzy", confidence)
@@ -0,0 +1,288 @@
+"""
+work_queue.py
+
+Hàng đợi công việc theo lease để nhiều worker / nhiều máy chia nhau một lượt crawl:
+- Mỗi dòng là một TMDb id (kèm cờ refresh, độ ưu tiên) thuộc một queue_name
+- Worker lease một lô id trong N giây; xong thì complete, lỗi thì fail (hết số lần thử -> 'failed')
+- Lease hết hạn (worker chết / bị kill) được worker khác tự động lấy lại
+- Hai backend cùng giao diện: bảng Crawl_Queue trên SQL Server (sql/SQLQuery1.sql)
+  và file SQLite cục bộ cho các lượt chạy offline / một máy
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List
+
+ENQUEUE_CHUNK = 500
+
+
+def _rows(items: Iterable[dict]):
+    for it in items:
+        if it.get("id") is not None:
+            yield int(it["id"]), int(bool(it.get("refresh"))), float(it.get("priority") or 0)
+
+
+def _chunks(rows, size: int = ENQUEUE_CHUNK):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class SqliteWorkQueue:
+    """Backend SQLite: an toàn giữa nhiều process trên cùng máy (mỗi thao tác là một transaction BEGIN IMMEDIATE)."""
+
+    def __init__(self, path: str, name: str = "crawl"):
+        self.path = path
+        self.name = name
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # isolation_level=None: tự quản lý transaction để lease là một khối nguyên tử
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS crawl_queue (
+                queue_name TEXT,
+                tmdb_id INTEGER,
+                refresh INTEGER DEFAULT 0,
+                priority REAL DEFAULT 0,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                worker TEXT,
+                lease_until REAL,
+                last_error TEXT,
+                enqueued_at REAL,
+                updated_at REAL,
+                PRIMARY KEY (queue_name, tmdb_id)
+            );
+            CREATE INDEX IF NOT EXISTS ix_crawl_queue_lease ON crawl_queue (queue_name, status, priority);
+        """)
+
+    def _run(self, func):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._db)
+                self._db.execute("COMMIT")
+                return result
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, items: Iterable[dict]) -> int:
+        """Thêm id chưa có trong queue; id đã xong mà item yêu cầu refresh thì mở lại. Trả về số dòng thêm/mở lại."""
+        added = 0
+        for chunk in _chunks(_rows(items)):
+            def upsert(db):
+                now = time.time()
+                before = db.total_changes
+                db.executemany("""
+                    INSERT INTO crawl_queue (queue_name, tmdb_id, refresh, priority, enqueued_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (queue_name, tmdb_id) DO UPDATE SET
+                        status = 'pending', refresh = 1, attempts = 0, priority = excluded.priority,
+                        updated_at = excluded.updated_at
+                    WHERE excluded.refresh = 1 AND status IN ('done', 'failed')
+                """, ((self.name, i, r, p, now, now) for i, r, p in chunk))
+                return db.total_changes - before
+            added += self._run(upsert)
+        return added
+
+    def lease(self, worker: str, n: int, lease_seconds: int) -> List[dict]:
+        def take(db):
+            now = time.time()
+            rows = db.execute("""
+                SELECT tmdb_id, refresh FROM crawl_queue
+                WHERE queue_name = ? AND (status = 'pending' OR (status = 'leased' AND lease_until < ?))
+                ORDER BY priority DESC, enqueued_at, tmdb_id LIMIT ?
+            """, (self.name, now, n)).fetchall()
+            db.executemany("""
+                UPDATE crawl_queue SET status = 'leased', worker = ?, lease_until = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE queue_name = ? AND tmdb_id = ?
+            """, ((worker, now + lease_seconds, now, self.name, tmdb_id) for tmdb_id, _ in rows))
+            return rows
+        return [{"id": tmdb_id, "refresh": bool(refresh)} for tmdb_id, refresh in self._run(take)]
+
+    def complete(self, tmdb_ids: Iterable[int]):
+        rows = [(time.time(), self.name, i) for i in tmdb_ids if i is not None]
+        self._run(lambda db: db.executemany("""
+            UPDATE crawl_queue SET status = 'done', lease_until = NULL, last_error = NULL, updated_at = ?
+            WHERE queue_name = ? AND tmdb_id = ?
+        """, rows))
+
+    def fail(self, worker: str, tmdb_ids: Iterable[int], error: str, max_attempts: int):
+        """Trả lease của worker về queue; id đã thử đủ max_attempts lần chuyển sang 'failed'."""
+        rows = [(max_attempts, error[:500], time.time(), self.name, i, worker) for i in tmdb_ids if i is not None]
+        self._run(lambda db: db.executemany("""
+            UPDATE crawl_queue SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                lease_until = NULL, last_error = ?, updated_at = ?
+            WHERE queue_name = ? AND tmdb_id = ? AND status = 'leased' AND worker = ?
+        """, rows))
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._run(lambda db: db.execute(
+            "SELECT status, COUNT(*) FROM crawl_queue WHERE queue_name = ? GROUP BY status", (self.name,)).fetchall()))
+
+    def close(self):
+        self._db.close()
+
+
+class SqlServerWorkQueue:
+    """
+    Backend SQL Server (bảng Crawl_Queue) dùng chung giữa nhiều máy.
+    Lease = một câu UPDATE trên TOP(n) dòng đọc với READPAST + UPDLOCK + ROWLOCK:
+    các worker bỏ qua dòng đang bị worker khác khóa nên không bao giờ lấy trùng id.
+    """
+
+    def __init__(self, connect: Callable[[], object], name: str = "crawl"):
+        self.name = name
+        self._lock = threading.Lock()
+        self.conn = connect()
+        self.cursor = self.conn.cursor()
+
+    def _run(self, func):
+        # connection riêng của queue, mỗi thao tác commit ngay để lock được nhả sớm
+        with self._lock:
+            try:
+                result = func(self.cursor)
+                self.conn.commit()
+                return result
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def enqueue(self, items: Iterable[dict]) -> int:
+        added = 0
+        for chunk in _chunks(_rows(items)):
+            def merge(cursor):
+                cursor.execute("CREATE TABLE #queue_in (tmdb_id INT PRIMARY KEY, refresh BIT, priority FLOAT)")
+                cursor.fast_executemany = True
+                cursor.executemany("INSERT INTO #queue_in VALUES (?, ?, ?)", list({r[0]: r for r in chunk}.values()))
+                cursor.fast_executemany = False
+                cursor.execute("""
+                    MERGE Crawl_Queue WITH (HOLDLOCK) AS t
+                    USING #queue_in AS s ON t.queue_name = ? AND t.tmdb_id = s.tmdb_id
+                    WHEN MATCHED AND s.refresh = 1 AND t.status IN ('done', 'failed') THEN
+                        UPDATE SET status = 'pending', refresh = 1, attempts = 0, priority = s.priority,
+                                   updated_at = SYSUTCDATETIME()
+                    WHEN NOT MATCHED THEN
+                        INSERT (queue_name, tmdb_id, refresh, priority) VALUES (?, s.tmdb_id, s.refresh, s.priority)
+                    OUTPUT $action;
+                """, self.name, self.name)
+                n = len(cursor.fetchall())
+                cursor.execute("DROP TABLE #queue_in")
+                return n
+            added += self._run(merge)
+        return added
+
+    def lease(self, worker: str, n: int, lease_seconds: int) -> List[dict]:
+        def take(cursor):
+            cursor.execute("""
+                WITH next AS (
+                    SELECT TOP (?) * FROM Crawl_Queue WITH (READPAST, UPDLOCK, ROWLOCK)
+                    WHERE queue_name = ?
+                      AND (status = 'pending' OR (status = 'leased' AND lease_until < SYSUTCDATETIME()))
+                    ORDER BY priority DESC, enqueued_at, tmdb_id
+                )
+                UPDATE next SET status = 'leased', worker = ?, attempts = attempts + 1,
+                    lease_until = DATEADD(SECOND, ?, SYSUTCDATETIME()), updated_at = SYSUTCDATETIME()
+                OUTPUT INSERTED.tmdb_id, INSERTED.refresh;
+            """, n, self.name, worker, lease_seconds)
+            return cursor.fetchall()
+        return [{"id": tmdb_id, "refresh": bool(refresh)} for tmdb_id, refresh in self._run(take)]
+
+    def complete(self, tmdb_ids: Iterable[int]):
+        rows = [(self.name, i) for i in tmdb_ids if i is not None]
+        if rows:
+            self._run(lambda cursor: cursor.executemany("""
+                UPDATE Crawl_Queue SET status = 'done', lease_until = NULL, last_error = NULL,
+                    updated_at = SYSUTCDATETIME()
+                WHERE queue_name = ? AND tmdb_id = ?
+            """, rows))
+
+    def fail(self, worker: str, tmdb_ids: Iterable[int], error: str, max_attempts: int):
+        rows = [(max_attempts, error[:500], self.name, i, worker) for i in tmdb_ids if i is not None]
+        if rows:
+            self._run(lambda cursor: cursor.executemany("""
+                UPDATE Crawl_Queue SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    lease_until = NULL, last_error = ?, updated_at = SYSUTCDATETIME()
+                WHERE queue_name = ? AND tmdb_id = ? AND status = 'leased' AND worker = ?
+            """, rows))
+
+    def stats(self) -> Dict[str, int]:
+        def count(cursor):
+            cursor.execute("SELECT status, COUNT(*) FROM Crawl_Queue WHERE queue_name = ? GROUP BY status", self.name)
+            return {status: n for status, n in cursor.fetchall()}
+        return self._run(count)
+
+    def close(self):
+        self.conn.close()
+
+
+def log_queue_stats(queue, label: str = "Work queue"):
+    st = Counter(queue.stats())
+    logging.info("%s [%s]: pending=%d leased=%d done=%d failed=%d",
+                 label, queue.name, st["pending"], st["leased"], st["done"], st["failed"])
+
+
+class LeaseFeed:
+    """
+    Nguồn item cho run_crawl lấy từ queue: lease từng lô khi lô trước đã được phát hết,
+    on_commit (committed) đánh dấu done, release() trả các id đã lease mà chưa commit về queue.
+    Chỉ lease thêm khi số id đã lease mà chưa commit < max_outstanding, để một worker không ôm hết queue
+    (chờ tối đa stall_timeout giây - id fetch lỗi không bao giờ commit nên không chờ mãi).
+    """
+
+    def __init__(self, queue, worker: str, batch_size: int, lease_seconds: int, max_attempts: int,
+                 max_outstanding: int = None, stall_timeout: float = 30.0):
+        self.queue = queue
+        self.worker = worker
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_outstanding = max_outstanding or 2 * batch_size
+        self.stall_timeout = stall_timeout
+        self.outstanding = set()
+        self.leased = 0
+        self.completed = 0
+        self._cond = threading.Condition()
+
+    def __iter__(self) -> Iterator[dict]:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self.outstanding) + self.batch_size <= self.max_outstanding,
+                                    timeout=self.stall_timeout)
+            batch = self.queue.lease(self.worker, self.batch_size, self.lease_seconds)
+            if not batch:
+                return
+            with self._cond:
+                self.outstanding.update(it["id"] for it in batch)
+                self.leased += len(batch)
+            logging.info("Work queue [%s]: %s leased %d ids for %ds", self.queue.name, self.worker,
+                         len(batch), self.lease_seconds)
+            yield from batch
+
+    def committed(self, tmdb_ids: Iterable[int]):
+        ids = [i for i in tmdb_ids if i is not None]
+        self.queue.complete(ids)
+        with self._cond:
+            self.outstanding.difference_update(ids)
+            self.completed += len(ids)
+            self._cond.notify_all()
+
+    def release(self, error: str = "not committed"):
+        with self._cond:
+            ids, self.outstanding = list(self.outstanding), set()
+        if ids:
+            self.queue.fail(self.worker, ids, error, self.max_attempts)
+            logging.warning("Work queue [%s]: returned %d uncommitted ids (%s)", self.queue.name, len(ids), error)
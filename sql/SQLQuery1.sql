@@ -21,6 +21,9 @@ CREATE TABLE People (
     created_at DATETIME DEFAULT GETDATE()
 );
 GO
+-- Tra cứu / khóa theo tên khi nhiều worker cùng thêm người (NameIdCache.resolve dùng UPDLOCK, HOLDLOCK)
+CREATE INDEX IX_People_person_name ON People(person_name);
+GO
 
 -- =========================================
 -- Table: Movies
@@ -29,6 +32,7 @@ IF OBJECT_ID('Movies', 'U') IS NOT NULL DROP TABLE Movies;
 GO
 CREATE TABLE Movies (
     movie_id NVARCHAR(50) PRIMARY KEY,
+    tmdb_id INT NULL,                      -- id TMDb (crawler lập lịch / refresh theo id này)
     title NVARCHAR(255) NOT NULL,
     description NVARCHAR(MAX) NULL,
     release_date DATE NULL,
@@ -39,6 +43,8 @@ CREATE TABLE Movies (
     created_at DATETIME DEFAULT GETDATE()
 );
 GO
+CREATE INDEX IX_Movies_tmdb_id ON Movies(tmdb_id);
+GO
 
 -- =========================================
 -- Table: Genres
@@ -121,6 +127,84 @@ CREATE TABLE Streaming_Popularity (
 );
 GO
 
+-- =========================================
+-- Table: Movie_Payload_Hash (hash nội dung theo phim + nguồn: payload không đổi thì crawler bỏ qua ghi)
+-- =========================================
+IF OBJECT_ID('Movie_Payload_Hash', 'U') IS NOT NULL DROP TABLE Movie_Payload_Hash;
+GO
+CREATE TABLE Movie_Payload_Hash (
+    movie_id NVARCHAR(50) FOREIGN KEY REFERENCES Movies(movie_id),
+    source NVARCHAR(20),                      -- 'tmdb' / 'omdb'
+    payload_hash BINARY(32) NOT NULL,         -- SHA-256 của payload đã chuẩn hóa
+    updated_at DATETIME DEFAULT GETDATE(),    -- lần cuối payload thay đổi
+    checked_at DATETIME DEFAULT GETDATE(),    -- lần cuối crawler kiểm tra (kể cả khi không đổi)
+    PRIMARY KEY (movie_id, source)
+);
+GO
+
+-- =========================================
+-- Table: Crawl_Queue (hàng đợi lease cho nhiều worker crawl - crawl data/work_queue.py)
+-- =========================================
+IF OBJECT_ID('Crawl_Queue', 'U') IS NOT NULL DROP TABLE Crawl_Queue;
+GO
+CREATE TABLE Crawl_Queue (
+    queue_name NVARCHAR(100) NOT NULL,
+    tmdb_id INT NOT NULL,
+    refresh BIT NOT NULL DEFAULT 0,
+    priority FLOAT NOT NULL DEFAULT 0,
+    status NVARCHAR(20) NOT NULL DEFAULT 'pending',   -- pending / leased / done / failed
+    attempts INT NOT NULL DEFAULT 0,
+    worker NVARCHAR(200) NULL,
+    lease_until DATETIME2 NULL,                        -- UTC, hết hạn thì worker khác được lease lại
+    last_error NVARCHAR(500) NULL,
+    enqueued_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME(),
+    updated_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME(),
+    PRIMARY KEY (queue_name, tmdb_id)
+);
+GO
+CREATE INDEX IX_Crawl_Queue_lease ON Crawl_Queue(queue_name, status, priority DESC, enqueued_at) INCLUDE (lease_until, refresh);
+GO
+
+-- =========================================
+-- Table: Movie_Crosswalk (id của phim ở từng nguồn -> movie_id; khớp một lần, các lượt sau join theo khóa)
+-- =========================================
+IF OBJECT_ID('Movie_Crosswalk', 'U') IS NOT NULL DROP TABLE Movie_Crosswalk;
+GO
+CREATE TABLE Movie_Crosswalk (
+    source NVARCHAR(20) NOT NULL,             -- 'tmdb' / 'imdb' (cũng là khóa OMDb i=) / 'rt' (slug URL Rotten Tomatoes)
+    source_key NVARCHAR(255) NOT NULL,
+    movie_id NVARCHAR(50) NOT NULL,
+    match_type NVARCHAR(20),                  -- 'id' (khóa có sẵn) / 'exact' / 'fuzzy' (khớp theo tên)
+    confidence FLOAT,
+    updated_at DATETIME DEFAULT GETDATE(),
+    PRIMARY KEY (source, source_key)
+);
+GO
+CREATE INDEX IX_Movie_Crosswalk_movie ON Movie_Crosswalk(movie_id, source) INCLUDE (source_key);
+GO
+
+-- =========================================
+-- Table: RT_Details (trang chi tiết phim Rotten Tomatoes - crawl data/rt_details.py)
+-- =========================================
+IF OBJECT_ID('RT_Details', 'U') IS NOT NULL DROP TABLE RT_Details;
+GO
+CREATE TABLE RT_Details (
+    rt_slug NVARCHAR(255) PRIMARY KEY,        -- slug URL RT (/m/<slug>), cùng khóa 'rt' của Movie_Crosswalk
+    movie_id NVARCHAR(50) NULL,               -- NULL khi phim RT chưa khớp được với Movies
+    critics_review_count INT NULL,            -- số review giới phê bình (Tomatometer)
+    audience_rating_count INT NULL,           -- số lượt đánh giá khán giả (RT chỉ công bố theo mức, vd 10,000+)
+    certified_fresh BIT NULL,
+    release_date_theaters DATE NULL,
+    release_date_streaming DATE NULL,
+    release_year INT NULL,
+    content_hash BINARY(32) NOT NULL,         -- sha256 phần dữ liệu của trang: không đổi thì không parse / ghi lại
+    updated_at DATETIME DEFAULT GETDATE(),    -- lần cuối nội dung thay đổi
+    checked_at DATETIME DEFAULT GETDATE()     -- lần cuối crawler tải trang
+);
+GO
+CREATE INDEX IX_RT_Details_movie ON RT_Details(movie_id) INCLUDE (critics_review_count, certified_fresh);
+GO
+
 PRINT '✅ Database XUHUONGPHIM và tất cả bảng đã được tạo thành công!';
 - =========================================
 -- 🔍 KIỂM TRA DỮ LIỆU SAU KHI CRAWL